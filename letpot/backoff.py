@@ -0,0 +1,32 @@
+"""Backoff for retries in Python client for LetPot hydroponic gardens."""
+
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class BackoffPolicy:
+    """Delays between retries, increasing exponentially up to a maximum.
+
+    With jitter, a random delay between 0 and the exponential delay is used ("full
+    jitter"), so clients which failed at the same time don't retry at the same time.
+    """
+
+    base: float = 1
+    """Delay (seconds) before the first delayed retry."""
+    factor: float = 2
+    """Multiplier for the delay after every retry."""
+    cap: float = 600
+    """Maximum delay (seconds)."""
+    jitter: bool = True
+    immediate_first_retry: bool = True
+    """Retry the first time without a delay."""
+
+    def delay(self, attempt: int) -> float:
+        """Returns the delay (seconds) before a retry (1 for the first retry)."""
+        if self.immediate_first_retry:
+            if attempt <= 1:
+                return 0
+            attempt -= 1
+        delay = min(self.cap, self.base * self.factor ** min(attempt - 1, 64))
+        return random.uniform(0, delay) if self.jitter else delay
@@ -1,11 +1,175 @@
 """Python client for LetPot hydroponic gardens."""
 
+import asyncio
+import inspect
+import json
+import logging
 import time
-from aiohttp import ClientSession, ClientResponse
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from types import TracebackType
+from typing import Any, Self
+from urllib.parse import urlsplit
 
-from letpot.exceptions import LetPotAuthenticationException, LetPotConnectionException
+from aiohttp import (
+    ClientError,
+    ClientSession,
+    ClientTimeout,
+    DummyCookieJar,
+    TCPConnector,
+)
 
-from .models import AuthenticationInfo, LetPotDevice
+from letpot.exceptions import (
+    LetPotAuthenticationException,
+    LetPotConnectionException,
+    LetPotException,
+)
+
+from .backoff import BackoffPolicy
+from .metrics import RequestStats
+from .models import AuthenticationInfo, LetPotDevice, LetPotDeviceChanges
+
+_LOGGER = logging.getLogger(__name__)
+
+TokenRefreshCallback = Callable[[AuthenticationInfo], None | Awaitable[None]]
+"""Callback for new authentication info after refreshing the access token."""
+
+DEFAULT_TIMEOUT = ClientTimeout(total=30, connect=10)
+"""Timeout for requests, when the client creates the session."""
+
+DEFAULT_RETRY_BACKOFF = BackoffPolicy(base=0.5, cap=30, immediate_first_retry=False)
+"""Delays between retries of requests which failed with a transient error."""
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+"""Response statuses for transient errors, for which requests are retried."""
+
+
+@dataclass(frozen=True, slots=True)
+class _Response:
+    """Status, headers and body of a response, read before releasing the connection."""
+
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+
+    def text(self) -> str:
+        """Returns the body decoded as text."""
+        return self.body.decode(errors="replace")
+
+    def json(self) -> Any:
+        """Returns the body decoded as JSON."""
+        try:
+            return json.loads(self.body)
+        except ValueError as err:
+            raise LetPotConnectionException(
+                f"Invalid JSON response ({self.status}): {self.text()[:200]}"
+            ) from err
+
+    def data(self, name: str) -> Any:
+        """Returns the data of an OK JSON response, or raises for another response."""
+        if self.status != 200:
+            raise LetPotConnectionException(
+                f"{name} returned {self.status}: {self.text()[:200]}"
+            )
+        body = self.json()
+        if not isinstance(body, dict) or body.get("ok") is not True:
+            message = body.get("message") if isinstance(body, dict) else body
+            raise LetPotConnectionException(f"Status not OK: {message}")
+        return body.get("data")
+
+    def retry_after(self) -> float | None:
+        """Returns the delay (seconds) from the Retry-After header, if any."""
+        if (value := self.headers.get("Retry-After")) is None:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+
+class LetPotCircuitBreaker:
+    """Fails requests to a host fast while it is down, instead of sending them.
+
+    After failure_threshold consecutive failures (server errors or connection errors)
+    for a host, the circuit opens and requests are not sent. After reset_timeout
+    seconds a single request is allowed, which closes the circuit if it succeeds.
+    A circuit breaker can be shared by multiple clients.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        """Initialize circuit breaker."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: dict[str, int] = {}
+        self._opened: dict[str, float] = {}
+
+    def is_open(self, host: str) -> bool:
+        """Returns if requests to the host are currently failing fast."""
+        return host in self._opened
+
+    def allow(self, host: str) -> bool:
+        """Returns if a request to the host can be sent."""
+        if (opened := self._opened.get(host)) is None:
+            return True
+        if time.monotonic() - opened < self.reset_timeout:
+            return False
+        # Allow a single trial request, others wait for another timeout
+        self._opened[host] = time.monotonic()
+        return True
+
+    def record_success(self, host: str) -> None:
+        """Record a successful request to the host, closing the circuit."""
+        self._failures.pop(host, None)
+        self._opened.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        """Record a failed request to the host, opening the circuit if required."""
+        failures = self._failures[host] = self._failures.get(host, 0) + 1
+        if failures >= self.failure_threshold:
+            self._opened[host] = time.monotonic()
+
+
+class LetPotRateLimiter:
+    """Limits the requests per host to a rate, allowing short bursts (token bucket).
+
+    A limiter can be shared by multiple clients, to limit their combined requests.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """Initialize limiter for rate requests per second, and burst requests at once."""
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    async def acquire(self, host: str) -> None:
+        """Wait until a request to the host is allowed."""
+        if (lock := self._locks.get(host)) is None:
+            lock = self._locks[host] = asyncio.Lock()
+        async with lock:
+            while True:
+                now = time.monotonic()
+                tokens, updated = self._buckets.get(host, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens >= 1:
+                    self._buckets[host] = (tokens - 1, now)
+                    return
+                self._buckets[host] = (tokens, now)
+                await asyncio.sleep((1 - tokens) / self.rate)
+
+
+@dataclass
+class _DeviceCache:
+    """Devices for a user, with the ETag and (monotonic) time of the response."""
+
+    devices: list[LetPotDevice]
+    etag: str | None
+    fetched: float
 
 
 class LetPotClient:
@@ -13,43 +177,304 @@ class LetPotClient:
 
     API_HOST = "https://api.letpot.net/app/"
 
-    _session: ClientSession
+    _session: ClientSession | None
     _access_token: str | None = None
     _access_token_expires: int = 0
     _refresh_token: str | None = None
     _refresh_token_expires: int = 0
     _user_id: str | None = None
     _email: str | None = None
+    _refresh_timer: asyncio.TimerHandle | None = None
+    _refresh_task: asyncio.Task | None = None
 
     def __init__(
         self,
         session: ClientSession | None = None,
         info: AuthenticationInfo | None = None,
+        *,
+        auto_refresh: bool = True,
+        refresh_margin: float = 300,
+        on_token_refresh: TokenRefreshCallback | None = None,
+        connector_limit: int = 100,
+        connector_limit_per_host: int = 0,
+        keepalive_timeout: float = 15,
+        dns_cache_ttl: int | None = 10,
+        timeout: ClientTimeout | None = None,
+        device_cache_ttl: float | None = None,
+        device_cache_stale: float = 0,
+        rate_limiter: LetPotRateLimiter | None = None,
+        retries: int = 3,
+        retry_backoff: BackoffPolicy = DEFAULT_RETRY_BACKOFF,
+        circuit_breaker: LetPotCircuitBreaker | None = None,
     ) -> None:
-        self._session = session if session else ClientSession()
+        """Initialize client.
+
+        With auto_refresh, the access token is refreshed when a request is unauthorized
+        or the token expired, if the refresh token is valid. Concurrent requests share a
+        single refresh. The on_token_refresh callback is called with the new
+        authentication info after every refresh, to store it. Only with this callback,
+        the token is also refreshed in the background refresh_margin seconds before it
+        expires, as the tokens change.
+
+        Without a session, the client creates one when required and closes it in
+        close(). The connector options (0 for no limit, None to disable the DNS cache)
+        only apply to this session, the timeout (default DEFAULT_TIMEOUT) overrides the
+        timeout of a session which is passed in.
+
+        With a device_cache_ttl, get_devices returns the devices for a user from a cache
+        for device_cache_ttl seconds. For device_cache_stale seconds after that, cached
+        devices are returned while they are refreshed in the background. When refreshing,
+        the cached devices are reused if the API responds that they are not modified.
+
+        The rate_limiter is used for all requests, to share a limit between clients.
+
+        Requests failing with a transient error (RETRY_STATUSES or a connection error)
+        are retried at most retries times, waiting according to retry_backoff or the
+        Retry-After header (up to the maximum backoff delay). The circuit_breaker
+        (default one for this client) fails requests fast while the API is down.
+        """
+        self._session = session
+        self._owns_session = session is None
+        self._connector_options: dict[str, Any] = {
+            "limit": connector_limit,
+            "limit_per_host": connector_limit_per_host,
+            "keepalive_timeout": keepalive_timeout,
+            "use_dns_cache": dns_cache_ttl is not None,
+            "ttl_dns_cache": dns_cache_ttl,
+        }
+        self._timeout = timeout
+        self._rate_limiter = rate_limiter
+        self._retries = retries
+        self._retry_backoff = retry_backoff
+        self._circuit_breaker = circuit_breaker or LetPotCircuitBreaker()
+        self._request_stats = RequestStats()
+        self._auto_refresh = auto_refresh
+        self._proactive_refresh = auto_refresh and on_token_refresh is not None
+        self._refresh_margin = refresh_margin
+        self._on_token_refresh = on_token_refresh
+        self._refresh_lock = asyncio.Lock()
+        self._device_cache_ttl = device_cache_ttl
+        self._device_cache_stale = device_cache_stale
+        self._device_cache: dict[str, _DeviceCache] = {}
+        self._device_requests: dict[str, asyncio.Task[list[LetPotDevice]]] = {}
+        self._device_snapshots: dict[str, list[LetPotDevice]] = {}
 
         if info is not None:
-            self._access_token = info.access_token
-            self._access_token_expires = info.access_token_expires
-            self._refresh_token = info.refresh_token
-            self._refresh_token_expires = info.refresh_token_expires
-            self._user_id = info.user_id
-            self._email = info.email
-
-    async def _request(self, method: str, path: str) -> ClientResponse:
-        """Make a request."""
+            self._set_info(info)
+
+    def _set_info(self, info: AuthenticationInfo) -> None:
+        """Use the authentication info for requests."""
+        self._access_token = info.access_token
+        self._access_token_expires = info.access_token_expires
+        self._refresh_token = info.refresh_token
+        self._refresh_token_expires = info.refresh_token_expires
+        self._user_id = info.user_id
+        self._email = info.email
+
+    def _can_refresh(self) -> bool:
+        """Returns if the access token can be refreshed automatically."""
+        return (
+            self._auto_refresh
+            and self._refresh_token is not None
+            and self._refresh_token_expires > time.time()
+        )
+
+    async def _refresh_access_token(self, token: str | None) -> None:
+        """Refresh the access token, unless a refresh replaced the token in the meantime."""
+        async with self._refresh_lock:
+            if self._access_token != token:
+                return
+            await self.refresh_token()
+
+    def _schedule_refresh(self) -> None:
+        """Schedule refreshing the access token before it expires."""
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        if not self._can_refresh():
+            return
+        delay = max(self._access_token_expires - self._refresh_margin - time.time(), 0)
+        self._refresh_timer = asyncio.get_running_loop().call_later(
+            delay, self._start_scheduled_refresh, self._access_token
+        )
+
+    def _start_scheduled_refresh(self, token: str | None) -> None:
+        """Start refreshing the access token in the background."""
+        self._refresh_timer = None
+        self._refresh_task = asyncio.create_task(self._refresh_access_token(token))
+        self._refresh_task.add_done_callback(self._log_refresh_error)
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task) -> None:
+        """Log an error refreshing the access token in the background."""
+        if not task.cancelled() and (err := task.exception()) is not None:
+            _LOGGER.warning("Refreshing access token failed: %s", err)
+
+    async def __aenter__(self) -> Self:
+        """Use the client in an async context manager, closing it on exit."""
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the client when exiting the context manager."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the client, stopping requests in the background.
+
+        Stops refreshing the access token, and closes the session if it was created
+        by the client.
+        """
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        for task in self._device_requests.values():
+            task.cancel()
+        self._device_requests.clear()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> ClientSession:
+        """Returns the session, creating it if required."""
+        if self._session is None:
+            self._session = ClientSession(
+                connector=TCPConnector(**self._connector_options),
+                timeout=self._timeout or DEFAULT_TIMEOUT,
+            )
+        return self._session
+
+    @property
+    def request_stats(self) -> RequestStats:
+        """Returns the counters for requests to the API."""
+        return self._request_stats
+
+    async def _fetch(
+        self,
+        method: str,
+        path: str,
+        headers: Mapping[str, str] | None = None,
+        data: Mapping[str, str] | None = None,
+    ) -> _Response:
+        """Send a request and read the response, always releasing the connection.
+
+        Transient errors are retried, and the response of the last attempt is returned.
+        Raises LetPotConnectionException if the request couldn't be sent.
+        """
+        host = urlsplit(self.API_HOST).netloc
+        kwargs: dict[str, Any] = {"headers": headers, "data": data}
+        if self._timeout is not None:
+            kwargs["timeout"] = self._timeout
+        attempt = 0
+        while True:
+            if not self._circuit_breaker.allow(host):
+                self._request_stats.short_circuits += 1
+                raise LetPotConnectionException(
+                    f"Not sending request, requests to {host} are failing"
+                )
+            if self._rate_limiter is not None:
+                await self._rate_limiter.acquire(host)
+
+            self._request_stats.requests += 1
+            response = None
+            try:
+                async with self._get_session().request(
+                    method, self.API_HOST + path, **kwargs
+                ) as raw_response:
+                    response = _Response(
+                        raw_response.status,
+                        raw_response.headers,
+                        await raw_response.read(),
+                    )
+            except (ClientError, TimeoutError) as err:
+                error: Exception = err
+            else:
+                error = LetPotConnectionException(f"{path} returned {response.status}")
+
+            if response is None or response.status >= 500:
+                self._circuit_breaker.record_failure(host)
+            elif response.status != 429:
+                self._circuit_breaker.record_success(host)
+
+            if response is not None and response.status not in RETRY_STATUSES:
+                return response
+            if attempt >= self._retries:
+                self._request_stats.failures += 1
+                if response is not None:
+                    return response
+                raise LetPotConnectionException(f"Request failed: {error}") from error
+
+            attempt += 1
+            self._request_stats.retries += 1
+            delay = self._retry_backoff.delay(attempt)
+            if response is not None and (retry_after := response.retry_after()):
+                delay = min(max(delay, retry_after), self._retry_backoff.cap)
+            _LOGGER.debug("Retrying %s in %.1f seconds: %s", path, delay, error)
+            await asyncio.sleep(delay)
+
+    async def _send(
+        self, method: str, path: str, headers: Mapping[str, str] | None = None
+    ) -> _Response:
+        """Send a request with the current access token."""
         if self._access_token is None:
             raise LetPotAuthenticationException("Missing access token, log in first")
         if self._user_id is None:
             raise LetPotAuthenticationException("Missing user id, log in first")
 
-        headers = {"Authorization": self._access_token, "uid": self._user_id}
+        headers = {
+            **(headers or {}),
+            "Authorization": self._access_token,
+            "uid": self._user_id,
+        }
+        return await self._fetch(method, path, headers=headers)
+
+    async def _request(
+        self, method: str, path: str, headers: Mapping[str, str] | None = None
+    ) -> _Response:
+        """Make a request, refreshing the access token if required."""
+        if self._can_refresh():
+            margin = 0.0
+            if self._proactive_refresh:
+                margin = self._refresh_margin
+                if self._refresh_timer is None:
+                    self._schedule_refresh()
+            if self._access_token_expires - margin < time.time():
+                try:
+                    await self._refresh_access_token(self._access_token)
+                except LetPotException as err:
+                    # Continue with the current access token while it is valid
+                    if self._access_token_expires < time.time():
+                        raise
+                    _LOGGER.warning("Refreshing access token failed: %s", err)
 
-        return await self._session.request(
-            method,
-            self.API_HOST + path,
-            headers=headers,
-        )
+        token = self._access_token
+        response = await self._send(method, path, headers)
+        if response.status == 401 and self._can_refresh():
+            _LOGGER.debug("Request unauthorized, refreshing access token")
+            await self._refresh_access_token(token)
+            response = await self._send(method, path, headers)
+        return response
+
+    def _set_tokens(self, data: Any) -> None:
+        """Use the access and refresh token from the login/refresh response data."""
+        try:
+            access_token = data["token"]["token"]
+            access_token_expires = data["token"]["exp"]
+            refresh_token = data["refreshToken"]["token"]
+            refresh_token_expires = data["refreshToken"]["exp"]
+        except (KeyError, TypeError) as err:
+            raise LetPotConnectionException("Response is missing tokens") from err
+        self._access_token = access_token
+        self._access_token_expires = access_token_expires
+        self._refresh_token = refresh_token
+        self._refresh_token_expires = refresh_token_expires
 
     async def login(self, email: str, password: str) -> AuthenticationInfo:
         """Log in and create new authentication info."""
@@ -59,22 +484,20 @@ class LetPotClient:
             "password": password,
             "refresh_token": "",
         }
-        response = await self._session.post(self.API_HOST + "auth/login", data=form)
+        response = await self._fetch("post", "auth/login", data=form)
 
         if response.status == 403:
             raise LetPotAuthenticationException("Invalid credentials")
 
-        json = await response.json()
-
-        if json["ok"] is not True:
-            raise LetPotConnectionException(f"Status not OK: {json['message']}")
-
-        self._access_token = json["data"]["token"]["token"]
-        self._access_token_expires = json["data"]["token"]["exp"]
-        self._refresh_token = json["data"]["refreshToken"]["token"]
-        self._refresh_token_expires = json["data"]["refreshToken"]["exp"]
-        self._user_id = json["data"]["user_id"]
+        data = response.data("login")
+        self._set_tokens(data)
+        try:
+            self._user_id = data["user_id"]
+        except (KeyError, TypeError) as err:
+            raise LetPotConnectionException("login returned no user id") from err
         self._email = email.lower()
+        if self._proactive_refresh:
+            self._schedule_refresh()
 
         return AuthenticationInfo(
             access_token=self._access_token or "",
@@ -91,24 +514,14 @@ class LetPotClient:
             raise LetPotAuthenticationException("Refresh token is missing or expired")
 
         headers = {"Rfs-Authorization": self._refresh_token}
-        response = await self._session.get(
-            self.API_HOST + "auth/refresh", headers=headers
-        )
+        response = await self._fetch("get", "auth/refresh", headers=headers)
 
         if response.status == 401:
             raise LetPotAuthenticationException("Invalid refresh token")
 
-        json = await response.json()
-
-        if json["ok"] is not True:
-            raise LetPotConnectionException(f"Status not OK: {json['message']}")
-
-        self._access_token = json["data"]["token"]["token"]
-        self._access_token_expires = json["data"]["token"]["exp"]
-        self._refresh_token = json["data"]["refreshToken"]["token"]
-        self._refresh_token_expires = json["data"]["refreshToken"]["exp"]
+        self._set_tokens(response.data("refresh_token"))
 
-        return AuthenticationInfo(
+        info = AuthenticationInfo(
             access_token=self._access_token or "",
             access_token_expires=self._access_token_expires,
             refresh_token=self._refresh_token or "",
@@ -116,32 +529,266 @@ class LetPotClient:
             user_id=self._user_id or "",
             email=self._email or "",
         )
+        if self._proactive_refresh:
+            self._schedule_refresh()
+        if self._on_token_refresh is not None:
+            result = self._on_token_refresh(info)
+            if inspect.isawaitable(result):
+                await result
+        return info
 
-    async def get_devices(self) -> list[LetPotDevice]:
-        """Get devices connected to the user."""
-        response = await self._request("get", "devices")
-
-        if response.status != 200:
-            text = await response.text()
+    async def _fetch_devices(self, user_id: str) -> list[LetPotDevice]:
+        """Request the devices connected to the user, updating the cache."""
+        cache = self._device_cache.get(user_id)
+        headers = None
+        if cache is not None and cache.etag is not None:
+            headers = {"If-None-Match": cache.etag}
+        response = await self._request("get", "devices", headers)
 
-            msg = f"get_devices returned {response.status}: {text}"
-            if response.status == 401:
-                raise LetPotAuthenticationException(msg)
-            else:
-                raise LetPotConnectionException(msg)
+        if response.status == 304 and cache is not None:
+            cache.fetched = time.monotonic()
+            return cache.devices
 
-        json = await response.json()
+        if response.status == 401:
+            raise LetPotAuthenticationException(
+                f"get_devices returned {response.status}: {response.text()}"
+            )
 
         devices = []
-        for device in json["data"]:
-            devices.append(
-                LetPotDevice(
-                    serial_number=device["sn"],
-                    name=device["name"],
-                    device_type=device["dev_type"],
-                    is_online=device["is_online"],
-                    is_remote=device.get("is_remote", None),
+        try:
+            for device in response.data("get_devices"):
+                devices.append(
+                    LetPotDevice(
+                        serial_number=device["sn"],
+                        name=device["name"],
+                        device_type=device["dev_type"],
+                        is_online=device["is_online"],
+                        is_remote=device.get("is_remote", None),
+                    )
                 )
-            )
+        except (AttributeError, KeyError, TypeError) as err:
+            raise LetPotConnectionException(
+                f"get_devices returned an invalid device: {err!r}"
+            ) from err
 
+        if self._device_cache_ttl is not None:
+            self._device_cache[user_id] = _DeviceCache(
+                devices, response.headers.get("ETag"), time.monotonic()
+            )
         return devices
+
+    def _start_fetch_devices(self, user_id: str) -> asyncio.Task[list[LetPotDevice]]:
+        """Returns the request for the devices of the user, starting it if required."""
+        if (task := self._device_requests.get(user_id)) is None:
+            task = asyncio.create_task(self._fetch_devices(user_id))
+            self._device_requests[user_id] = task
+            task.add_done_callback(lambda _: self._device_requests.pop(user_id, None))
+        return task
+
+    @staticmethod
+    def _log_revalidate_error(task: asyncio.Task) -> None:
+        """Log an error refreshing stale cached devices in the background."""
+        if not task.cancelled() and (err := task.exception()) is not None:
+            _LOGGER.warning("Refreshing cached devices failed: %s", err)
+
+    async def get_devices(self, force_refresh: bool = False) -> list[LetPotDevice]:
+        """Get devices connected to the user.
+
+        Concurrent calls share a single request. If the device cache is enabled, cached
+        devices are returned unless they are expired or force_refresh is set.
+        """
+        user_id = self._user_id or ""
+        cache = self._device_cache.get(user_id)
+        if (
+            cache is not None
+            and self._device_cache_ttl is not None
+            and not force_refresh
+        ):
+            age = time.monotonic() - cache.fetched
+            if age < self._device_cache_ttl:
+                return list(cache.devices)
+            if age < self._device_cache_ttl + self._device_cache_stale:
+                if user_id not in self._device_requests:
+                    task = self._start_fetch_devices(user_id)
+                    task.add_done_callback(self._log_revalidate_error)
+                return list(cache.devices)
+
+        return list(await asyncio.shield(self._start_fetch_devices(user_id)))
+
+    async def get_device_changes(self) -> LetPotDeviceChanges:
+        """Get the changes to the devices connected to the user since the previous call.
+
+        For the first call, all devices are added.
+        """
+        user_id = self._user_id or ""
+        devices = await self.get_devices()
+        changes = LetPotDeviceChanges.compare(
+            self._device_snapshots.get(user_id, []), devices
+        )
+        self._device_snapshots[user_id] = devices
+        return changes
+
+
+@dataclass
+class LetPotAccountSync:
+    """Result of synchronizing an account, with the devices or the error."""
+
+    email: str
+    info: AuthenticationInfo | None
+    """Authentication info after logging in or refreshing, None if it failed."""
+    devices: list[LetPotDevice] | None
+    error: Exception | None
+
+
+class LetPotClientPool:
+    """Clients for multiple accounts, sharing one session and connection pool.
+
+    Accounts are identified by their (lowercase) email address. Requests for all
+    accounts share the connector limits, a rate limit and a circuit breaker per host.
+    """
+
+    _clients: dict[str, LetPotClient]
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = 20,
+        rate_limit: float | None = 10,
+        rate_burst: int = 10,
+        connector_limit: int = 100,
+        connector_limit_per_host: int = 0,
+        keepalive_timeout: float = 15,
+        dns_cache_ttl: int | None = 10,
+        timeout: ClientTimeout | None = None,
+        on_token_refresh: TokenRefreshCallback | None = None,
+    ) -> None:
+        """Initialize pool.
+
+        At most concurrency accounts are synchronized at the same time, with at most
+        rate_limit requests per second (None for no limit) to the API host. Token
+        refreshes are passed to on_token_refresh, like for a single client.
+        """
+        self._clients = {}
+        self._session: ClientSession | None = None
+        self._concurrency = concurrency
+        self._rate_limiter = (
+            LetPotRateLimiter(rate_limit, rate_burst)
+            if rate_limit is not None
+            else None
+        )
+        self._connector_options: dict[str, Any] = {
+            "limit": connector_limit,
+            "limit_per_host": connector_limit_per_host,
+            "keepalive_timeout": keepalive_timeout,
+            "use_dns_cache": dns_cache_ttl is not None,
+            "ttl_dns_cache": dns_cache_ttl,
+        }
+        self._timeout = timeout
+        self._on_token_refresh = on_token_refresh
+        self._circuit_breaker = LetPotCircuitBreaker()
+
+    def __len__(self) -> int:
+        """Returns the number of accounts in the pool."""
+        return len(self._clients)
+
+    async def __aenter__(self) -> Self:
+        """Use the pool in an async context manager, closing it on exit."""
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the pool when exiting the context manager."""
+        await self.close()
+
+    def _get_session(self) -> ClientSession:
+        """Returns the shared session, creating it if required.
+
+        The session doesn't keep cookies, as it is used for multiple accounts.
+        """
+        if self._session is None:
+            self._session = ClientSession(
+                connector=TCPConnector(**self._connector_options),
+                timeout=self._timeout or DEFAULT_TIMEOUT,
+                cookie_jar=DummyCookieJar(),
+            )
+        return self._session
+
+    def client(
+        self, email: str, info: AuthenticationInfo | None = None
+    ) -> LetPotClient:
+        """Get the client for an account, creating it if required.
+
+        The info is used unless the client has an access token which expires later.
+        """
+        email = email.lower()
+        if (client := self._clients.get(email)) is None:
+            client = self._clients[email] = LetPotClient(
+                self._get_session(),
+                info,
+                on_token_refresh=self._on_token_refresh,
+                rate_limiter=self._rate_limiter,
+                circuit_breaker=self._circuit_breaker,
+            )
+        elif (
+            info is not None
+            and info.access_token_expires > client._access_token_expires
+        ):
+            client._set_info(info)
+        return client
+
+    async def _sync(
+        self, account: AuthenticationInfo | tuple[str, str]
+    ) -> LetPotAccountSync:
+        """Log in (for credentials) or refresh (for expired info), and get devices."""
+        email = account[0] if isinstance(account, tuple) else account.email
+        info = None
+        try:
+            if isinstance(account, tuple):
+                info = await self.client(email).login(*account)
+            else:
+                client = self.client(email, account)
+                info = account if account.is_valid else await client.refresh_token()
+            devices = await self.client(email).get_devices()
+        except Exception as err:  # noqa: BLE001
+            return LetPotAccountSync(email, info, None, err)
+        return LetPotAccountSync(email, info, devices, None)
+
+    async def iter_sync(
+        self, accounts: Iterable[AuthenticationInfo | tuple[str, str]]
+    ) -> AsyncIterator[LetPotAccountSync]:
+        """Synchronize accounts, yielding the result for each account as it completes.
+
+        Accounts are authentication info or (email, password) credentials. An error for
+        an account is included in its result, and doesn't stop the other accounts.
+        """
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def sync(
+            account: AuthenticationInfo | tuple[str, str],
+        ) -> LetPotAccountSync:
+            async with semaphore:
+                return await self._sync(account)
+
+        tasks = [asyncio.create_task(sync(account)) for account in accounts]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def remove(self, email: str) -> None:
+        """Remove an account from the pool, closing its client."""
+        if (client := self._clients.pop(email.lower(), None)) is not None:
+            await client.close()
+
+    async def close(self) -> None:
+        """Remove all accounts from the pool, and close the shared session."""
+        await asyncio.gather(*(self.remove(email) for email in list(self._clients)))
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
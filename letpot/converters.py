@@ -1,10 +1,14 @@
 """Python client for LetPot hydroponic gardens."""
 
 import logging
-import math
+import struct
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Mapping, Sequence
 from datetime import time
-from typing import Sequence
+from enum import IntEnum
+from functools import cache, partial
+from operator import eq
+from typing import Any, ClassVar
 
 from aiomqtt.types import PayloadType
 
@@ -26,10 +30,113 @@ MODEL_PRO = ("LetPot Pro", "LPH-PRO")
 MODEL_SE = ("LetPot Senior", "LPH-SE")
 
 
+class MessageLayout:
+    """Byte layout of a device message, compiled to a struct for (un)packing.
+
+    Fields are (name, format) pairs in message order. The format is a big-endian
+    struct format character, "x" for a padding byte or "T" for a time of day
+    (hour and minute byte, as an unsigned short).
+    """
+
+    def __init__(self, fields: Sequence[tuple[str, str]]) -> None:
+        """Compile the layout."""
+        self.fields = tuple((name, fmt) for name, fmt in fields if fmt != "x")
+        self.names = tuple(name for name, _ in self.fields)
+        self._struct = struct.Struct(
+            ">" + "".join("H" if fmt == "T" else fmt for _, fmt in fields)
+        )
+        self.size = self._struct.size
+
+    def unpack(self, data: bytes, offset: int = 0) -> dict[str, int]:
+        """Unpack the field values from data, starting at offset."""
+        return dict(zip(self.names, self._struct.unpack_from(data, offset)))
+
+    def pack(self, values: Sequence[int]) -> bytes:
+        """Pack the field values, in field order, to bytes."""
+        try:
+            return self._struct.pack(*values)
+        except struct.error as exception:
+            raise LetPotException("Unable to pack message") from exception
+
+
+_SCHEDULE_FIELDS = (
+    ("system_on", "B"),
+    ("pump_mode", "B"),
+    ("light_mode", "B"),
+    ("plant_days", "H"),
+    ("light_schedule_start", "T"),
+    ("light_schedule_end", "T"),
+)
+"""Fields at the start of every status and update message (after the header)."""
+
+_STATUS_DEFAULTS = ("light_brightness", "pump_nutrient", "pump_status", "system_sound")
+"""Status fields without a default value, set to None if not in the status layout."""
+
+
+def _enum_decoder(enum: type[IntEnum]) -> Callable[[int], Any]:
+    """Create a function for decoding a message value to an enum member."""
+    return {member.value: member for member in enum}.__getitem__
+
+
+_STATUS_DECODERS: dict[str, Callable[[int], Any]] = {
+    "light_mode": _enum_decoder(LightMode),
+    "online": partial(eq, 0),
+    "pump_nutrient": partial(eq, 1),
+    "system_on": partial(eq, 1),
+    "system_sound": partial(eq, 1),
+    "temperature_unit": _enum_decoder(TemperatureUnit),
+}
+"""Functions for decoding a message value to a status value, by field name."""
+
+_STATUS_ENCODERS: dict[str, Callable[[Any], int]] = {
+    "pump_nutrient": lambda value: 1 if value is True else 0,
+    "system_on": lambda value: 1 if value else 0,
+    "system_sound": lambda value: 1 if value is True else 0,
+    "temperature_unit": lambda value: 1 if value is TemperatureUnit.CELSIUS else 0,
+}
+"""Functions for encoding a status value to a message value, by field name."""
+
+
+@cache
+def _decode_time(value: int) -> time:
+    """Decode a time of day from an unsigned short (hour and minute byte)."""
+    return time(hour=value >> 8, minute=value & 255)
+
+
+def _encode_time(value: time) -> int:
+    """Encode a time of day to an unsigned short (hour and minute byte)."""
+    return (value.hour << 8) | value.minute
+
+
+def _encode_value(value: int | None) -> int:
+    """Encode a numeric status value, using 0 for values which aren't available."""
+    return 0 if value is None else value
+
+
 class LetPotDeviceConverter(ABC):
-    """Base class for converters and info for device types."""
+    """Base class for converters and info for device types.
+
+    Messages are converted using the layouts and error bits declared by the
+    subclass. A status message has a 4 byte header, the status type and subtype
+    1, followed by the status layout. An update message has the command type and
+    subtype 2, followed by the update layout.
+    """
+
+    _command_type: ClassVar[int]
+    _status_type: ClassVar[int]
+    _status_layout: ClassVar[MessageLayout]
+    _update_layout: ClassVar[MessageLayout]
+    _error_bits: ClassVar[Sequence[tuple[str, int]]]
+    """Errors in the status errors byte, as (error name, bitmask) pairs."""
+    _unsupported_errors: ClassVar[Mapping[str, Sequence[str]]] = {}
+    """Errors (from error bits) which aren't supported by a device type."""
 
     _device_type: str
+    _error_bits_supported: tuple[tuple[str, int], ...]
+    _errors: dict[int, LetPotDeviceErrors]
+    _status_decoders: tuple[tuple[str, Callable[[int], Any]], ...]
+    _status_defaults: dict[str, Any]
+    _update_encoders: tuple[tuple[str, Callable[[Any], int]], ...]
 
     def __init__(self, device_type: str) -> None:
         """Initialize converter."""
@@ -37,6 +144,29 @@ class LetPotDeviceConverter(ABC):
             raise LetPotException("Initializing converter with unsupported device type")
         self._device_type = device_type
 
+        unsupported = self._unsupported_errors.get(device_type, ())
+        self._error_bits_supported = tuple(
+            (name, bit) for name, bit in self._error_bits if name not in unsupported
+        )
+        self._errors = {}
+        self._status_decoders = tuple(
+            (name, _decode_time if fmt == "T" else _STATUS_DECODERS[name])
+            for name, fmt in self._status_layout.fields
+            if fmt == "T" or name in _STATUS_DECODERS
+        )
+        self._status_defaults = dict.fromkeys(
+            name for name in _STATUS_DEFAULTS if name not in self._status_layout.names
+        )
+        self._update_encoders = tuple(
+            (
+                name,
+                _encode_time
+                if fmt == "T"
+                else _STATUS_ENCODERS.get(name, _encode_value),
+            )
+            for name, fmt in self._update_layout.fields
+        )
+
     @staticmethod
     @abstractmethod
     def supports_type(device_type: str) -> bool:
@@ -51,43 +181,90 @@ class LetPotDeviceConverter(ABC):
     def supported_features(self) -> DeviceFeature:
         """Returns the device supported feature(s)."""
 
-    @abstractmethod
     def get_current_status_message(self) -> list[int]:
         """Returns the message content for getting the current device status."""
-        pass
+        return [self._command_type, 1]
 
-    @abstractmethod
     def convert_hex_to_status(self, message: PayloadType) -> LetPotDeviceStatus | None:
         """Converts a hexadecimal bytes status message to a status dataclass."""
-        pass
+        data = self._hex_bytes_to_bytes(message)
+        if data is None:
+            _LOGGER.debug("Invalid message received, ignoring: %s", message)
+            return None
+        return self.convert_bytes_to_status(data)
+
+    def convert_bytes_to_status(self, data: bytes) -> LetPotDeviceStatus | None:
+        """Converts a bytes status message to a status dataclass."""
+        if (
+            len(data) < 6 + self._status_layout.size
+            or data[4] != self._status_type
+            or data[5] != 1
+        ):
+            _LOGGER.debug("Invalid message received, ignoring: %s", data.hex())
+            return None
+
+        values: dict[str, Any] = self._status_layout.unpack(data, 6)
+        for name, decoder in self._status_decoders:
+            values[name] = decoder(values[name])
+        values["errors"] = self._decode_errors(values["errors"])
+        return LetPotDeviceStatus(raw=list(data), **values, **self._status_defaults)
 
-    @abstractmethod
     def get_update_status_message(self, status: LetPotDeviceStatus) -> list[int]:
         """Returns the message content for updating the device status."""
-        pass
+        values = self._update_layout.pack(
+            [encoder(getattr(status, name)) for name, encoder in self._update_encoders]
+        )
+        return [self._command_type, 2, *values]
 
     @abstractmethod
     def get_light_brightness_levels(self) -> list[int]:
         """Returns the brightness steps supported by the device for this converter."""
         pass
 
-    def _hex_bytes_to_int_array(self, hex_message: PayloadType) -> list[int] | None:
-        """Converts a hexadecimal bytes message to a list of integers."""
+    def _decode_errors(self, value: int) -> LetPotDeviceErrors:
+        """Decodes the status errors byte, sharing the (immutable) errors per value."""
+        if (errors := self._errors.get(value)) is None:
+            errors = self._errors[value] = LetPotDeviceErrors(
+                **{"low_water": None}
+                | {name: value & bit != 0 for name, bit in self._error_bits_supported}
+            )
+        return errors
+
+    def _hex_bytes_to_bytes(self, hex_message: PayloadType) -> bytes | None:
+        """Converts a hexadecimal bytes message to an immutable buffer of bytes."""
         if not isinstance(hex_message, bytes):
             return None
         try:
-            decoded_hex = hex_message.decode("utf-8")
-            integers = []
-            for n in range(0, len(decoded_hex), 2):
-                integers.append(int(decoded_hex[n : n + 2], 16))
-            return integers
-        except Exception as exception:
+            return bytes.fromhex(hex_message.decode("ascii"))
+        except ValueError as exception:
             raise LetPotException("Unable to convert from hex") from exception
 
 
 class LPHx1Converter(LetPotDeviceConverter):
     """Converters and info for device type LPH11 (Mini), LPH21 (Air), LPH31 (SE)."""
 
+    _command_type = 97
+    _status_type = 98
+    _status_layout = MessageLayout(
+        [
+            ("online", "B"),
+            ("errors", "B"),
+            *_SCHEDULE_FIELDS,
+            ("light_brightness", "H"),
+            ("pump_status", "B"),
+            ("system_sound", "B"),
+        ]
+    )
+    _update_layout = MessageLayout(
+        [
+            *_SCHEDULE_FIELDS,
+            ("light_brightness", "H"),
+            ("system_sound", "B"),
+        ]
+    )
+    _error_bits = [("low_water", 1), ("pump_malfunction", 2)]
+    _unsupported_errors = {"LPH21": ["pump_malfunction"]}
+
     @staticmethod
     def supports_type(device_type: str) -> bool:
         return device_type in ["LPH11", "LPH21", "LPH31"]
@@ -108,59 +285,6 @@ class LPHx1Converter(LetPotDeviceConverter):
             features |= DeviceFeature.LIGHT_BRIGHTNESS_LOW_HIGH
         return features
 
-    def get_current_status_message(self) -> list[int]:
-        return [97, 1]
-
-    def get_update_status_message(self, status: LetPotDeviceStatus) -> list[int]:
-        return [
-            97,
-            2,
-            1 if status.system_on else 0,
-            status.pump_mode,
-            status.light_mode.value,
-            math.floor(status.plant_days / 256),
-            status.plant_days % 256,
-            status.light_schedule_start.hour,
-            status.light_schedule_start.minute,
-            status.light_schedule_end.hour,
-            status.light_schedule_end.minute,
-            math.floor(status.light_brightness / 256)
-            if status.light_brightness is not None
-            else 0,
-            status.light_brightness % 256 if status.light_brightness is not None else 0,
-            1 if status.system_sound is True else 0,
-        ]
-
-    def convert_hex_to_status(self, message: PayloadType) -> LetPotDeviceStatus | None:
-        data = self._hex_bytes_to_int_array(message)
-        if data is None or data[4] != 98 or data[5] != 1:
-            _LOGGER.debug("Invalid message received, ignoring: %s", message)
-            return None
-
-        if self._device_type == "LPH21":
-            error_pump_malfunction = None
-        else:
-            error_pump_malfunction = True if data[7] & 2 else False
-
-        return LetPotDeviceStatus(
-            raw=data,
-            light_brightness=256 * data[17] + data[18],
-            light_mode=LightMode(data[10]),
-            light_schedule_end=time(hour=data[15], minute=data[16]),
-            light_schedule_start=time(hour=data[13], minute=data[14]),
-            online=data[6] == 0,
-            plant_days=256 * data[11] + data[12],
-            pump_mode=data[9],
-            pump_nutrient=None,
-            pump_status=data[19],
-            system_on=data[8] == 1,
-            system_sound=data[20] == 1 if data[20] is not None else None,
-            errors=LetPotDeviceErrors(
-                low_water=True if data[7] & 1 else False,
-                pump_malfunction=error_pump_malfunction,
-            ),
-        )
-
     def get_light_brightness_levels(self) -> list[int]:
         return [500, 1000] if self._device_type in ["LPH21", "LPH31"] else []
 
@@ -168,6 +292,25 @@ class LPHx1Converter(LetPotDeviceConverter):
 class IGSorAltConverter(LetPotDeviceConverter):
     """Converters and info for device type IGS01 (Pro), LPH27, LPH37 (SE), LPH39 (Mini)."""
 
+    _command_type = 11
+    _status_type = 12
+    _status_layout = MessageLayout(
+        [
+            ("online", "B"),
+            ("errors", "B"),
+            *_SCHEDULE_FIELDS,
+            ("system_sound", "B"),
+        ]
+    )
+    _update_layout = MessageLayout(
+        [
+            *_SCHEDULE_FIELDS,
+            ("system_sound", "B"),
+        ]
+    )
+    _error_bits = [("low_water", 1)]
+    _unsupported_errors = {"IGS01": ["low_water"]}
+
     @staticmethod
     def supports_type(device_type: str) -> bool:
         return device_type in ["IGS01", "LPH27", "LPH37", "LPH39"]
@@ -185,52 +328,6 @@ class IGSorAltConverter(LetPotDeviceConverter):
     def supported_features(self) -> DeviceFeature:
         return DeviceFeature.CATEGORY_HYDROPONIC_GARDEN
 
-    def get_current_status_message(self) -> list[int]:
-        return [11, 1]
-
-    def get_update_status_message(self, status: LetPotDeviceStatus) -> list[int]:
-        return [
-            11,
-            2,
-            1 if status.system_on else 0,
-            status.pump_mode,
-            status.light_mode.value,
-            math.floor(status.plant_days / 256),
-            status.plant_days % 256,
-            status.light_schedule_start.hour,
-            status.light_schedule_start.minute,
-            status.light_schedule_end.hour,
-            status.light_schedule_end.minute,
-            1 if status.system_sound is True else 0,
-        ]
-
-    def convert_hex_to_status(self, message: PayloadType) -> LetPotDeviceStatus | None:
-        data = self._hex_bytes_to_int_array(message)
-        if data is None or data[4] != 12 or data[5] != 1:
-            _LOGGER.debug("Invalid message received, ignoring: %s", message)
-            return None
-
-        if self._device_type == "IGS01":
-            error_low_water = None
-        else:
-            error_low_water = True if data[7] & 1 else False
-
-        return LetPotDeviceStatus(
-            raw=data,
-            light_brightness=None,
-            light_mode=LightMode(data[10]),
-            light_schedule_end=time(hour=data[15], minute=data[16]),
-            light_schedule_start=time(hour=data[13], minute=data[14]),
-            online=data[6] == 0,
-            plant_days=256 * data[11] + data[12],
-            pump_mode=data[9],
-            pump_nutrient=None,
-            pump_status=None,
-            system_on=data[8] == 1,
-            system_sound=data[17] == 1 if data[17] is not None else None,
-            errors=LetPotDeviceErrors(low_water=error_low_water),
-        )
-
     def get_light_brightness_levels(self) -> list[int]:
         return []
 
@@ -238,6 +335,34 @@ class IGSorAltConverter(LetPotDeviceConverter):
 class LPH6xConverter(LetPotDeviceConverter):
     """Converters and info for device type LPH60, LPH61, LPH62 (Max)."""
 
+    _command_type = 13
+    _status_type = 14
+    _status_layout = MessageLayout(
+        [
+            ("online", "B"),
+            ("errors", "B"),
+            *_SCHEDULE_FIELDS,
+            ("water_mode", "B"),
+            ("light_brightness", "H"),
+            ("water_level", "H"),
+            ("temperature_value", "H"),
+            ("temperature_unit", "B"),
+            ("system_sound", "B"),
+            ("pump_nutrient", "B"),
+        ]
+    )
+    _update_layout = MessageLayout(
+        [
+            *_SCHEDULE_FIELDS,
+            ("water_mode", "B"),
+            ("light_brightness", "H"),
+            ("temperature_unit", "B"),
+            ("system_sound", "B"),
+            ("pump_nutrient", "B"),
+        ]
+    )
+    _error_bits = [("low_water", 2), ("low_nutrients", 1), ("refill_error", 4)]
+
     @staticmethod
     def supports_type(device_type: str) -> bool:
         return device_type in ["LPH60", "LPH61", "LPH62"]
@@ -258,62 +383,6 @@ class LPH6xConverter(LetPotDeviceConverter):
             features |= DeviceFeature.NUTRIENT_BUTTON
         return features
 
-    def get_current_status_message(self) -> list[int]:
-        return [13, 1]
-
-    def get_update_status_message(self, status: LetPotDeviceStatus) -> list[int]:
-        return [
-            13,
-            2,
-            1 if status.system_on else 0,
-            status.pump_mode,
-            status.light_mode.value,
-            math.floor(status.plant_days / 256),
-            status.plant_days % 256,
-            status.light_schedule_start.hour,
-            status.light_schedule_start.minute,
-            status.light_schedule_end.hour,
-            status.light_schedule_end.minute,
-            status.water_mode if status.water_mode is not None else 0,
-            math.floor(status.light_brightness / 256)
-            if status.light_brightness is not None
-            else 0,
-            status.light_brightness % 256 if status.light_brightness is not None else 0,
-            1 if status.temperature_unit is TemperatureUnit.CELSIUS else 0,
-            1 if status.system_sound is True else 0,
-            1 if status.pump_nutrient is True else 0,
-        ]
-
-    def convert_hex_to_status(self, message: PayloadType) -> LetPotDeviceStatus | None:
-        data = self._hex_bytes_to_int_array(message)
-        if data is None or data[4] != 14 or data[5] != 1:
-            _LOGGER.debug("Invalid message received, ignoring: %s", message)
-            return None
-
-        return LetPotDeviceStatus(
-            raw=data,
-            light_brightness=256 * data[18] + data[19],
-            light_mode=LightMode(data[10]),
-            light_schedule_end=time(hour=data[15], minute=data[16]),
-            light_schedule_start=time(hour=data[13], minute=data[14]),
-            online=data[6] == 0,
-            plant_days=256 * data[11] + data[12],
-            pump_mode=data[9],
-            pump_nutrient=data[26] == 1,
-            pump_status=None,
-            system_on=data[8] == 1,
-            system_sound=data[25] == 1 if data[25] is not None else None,
-            errors=LetPotDeviceErrors(
-                low_water=True if data[7] & 2 else False,
-                low_nutrients=True if data[7] & 1 else False,
-                refill_error=True if data[7] & 4 else False,
-            ),
-            temperature_unit=TemperatureUnit(data[24]),
-            temperature_value=256 * data[22] + data[23],
-            water_level=256 * data[20] + data[21],
-            water_mode=data[17],
-        )
-
     def get_light_brightness_levels(self) -> list[int]:
         return [0, 125, 250, 375, 500, 625, 750, 875, 1000]
 
@@ -321,6 +390,31 @@ class LPH6xConverter(LetPotDeviceConverter):
 class LPH63Converter(LetPotDeviceConverter):
     """Converters and info for device type LPH63 (Max)."""
 
+    _command_type = 101
+    _status_type = 102
+    _status_layout = MessageLayout(
+        [
+            ("online", "B"),
+            ("errors", "B"),
+            *_SCHEDULE_FIELDS,
+            ("water_mode", "B"),
+            ("light_brightness", "H"),
+            ("water_level", "H"),
+            ("temperature_value", "H"),
+            ("temperature_unit", "B"),
+            ("", "x"),
+            ("pump_status", "B"),
+        ]
+    )
+    _update_layout = MessageLayout(
+        [
+            *_SCHEDULE_FIELDS,
+            ("water_mode", "B"),
+            ("light_brightness", "H"),
+        ]
+    )
+    _error_bits = [("low_water", 2), ("low_nutrients", 1), ("refill_error", 4)]
+
     @staticmethod
     def supports_type(device_type: str) -> bool:
         return device_type in ["LPH63"]
@@ -339,66 +433,33 @@ class LPH63Converter(LetPotDeviceConverter):
             | DeviceFeature.WATER_LEVEL
         )
 
-    def get_current_status_message(self) -> list[int]:
-        return [101, 1]
-
-    def get_update_status_message(self, status: LetPotDeviceStatus) -> list[int]:
-        return [
-            101,
-            2,
-            1 if status.system_on else 0,
-            status.pump_mode,
-            0 if status.light_mode is LightMode.FLOWER else 1,
-            math.floor(status.plant_days / 256),
-            status.plant_days % 256,
-            status.light_schedule_start.hour,
-            status.light_schedule_start.minute,
-            status.light_schedule_end.hour,
-            status.light_schedule_end.minute,
-            status.water_mode if status.water_mode is not None else 0,
-            math.floor(status.light_brightness / 256)
-            if status.light_brightness is not None
-            else 0,
-            status.light_brightness % 256 if status.light_brightness is not None else 0,
-        ]
-
-    def convert_hex_to_status(self, message: PayloadType) -> LetPotDeviceStatus | None:
-        data = self._hex_bytes_to_int_array(message)
-        if data is None or data[4] != 102 or data[5] != 1:
-            _LOGGER.debug("Invalid message received, ignoring: %s", message)
-            return None
-
-        return LetPotDeviceStatus(
-            raw=data,
-            light_brightness=256 * data[18] + data[19],
-            light_mode=LightMode(data[10]),
-            light_schedule_end=time(hour=data[15], minute=data[16]),
-            light_schedule_start=time(hour=data[13], minute=data[14]),
-            online=data[6] == 0,
-            plant_days=256 * data[11] + data[12],
-            pump_mode=data[9],
-            pump_nutrient=None,
-            pump_status=data[26],
-            system_on=data[8] == 1,
-            system_sound=None,
-            errors=LetPotDeviceErrors(
-                low_water=True if data[7] & 2 else False,
-                low_nutrients=True if data[7] & 1 else False,
-                refill_error=True if data[7] & 4 else False,
-            ),
-            temperature_unit=TemperatureUnit(data[24]),
-            temperature_value=256 * data[22] + data[23],
-            water_level=256 * data[20] + data[21],
-            water_mode=data[17],
-        )
-
     def get_light_brightness_levels(self) -> list[int]:
         return [0, 125, 250, 375, 500, 625, 750, 875, 1000]
 
 
-CONVERTERS: Sequence[type[LetPotDeviceConverter]] = [
+CONVERTERS: list[type[LetPotDeviceConverter]] = [
     LPHx1Converter,
     IGSorAltConverter,
     LPH6xConverter,
     LPH63Converter,
 ]
+
+_CONVERTER_INSTANCES: dict[str, LetPotDeviceConverter] = {}
+
+
+def register_converter(converter: type[LetPotDeviceConverter]) -> None:
+    """Register a converter class, taking precedence over existing converters."""
+    CONVERTERS.insert(0, converter)
+    _CONVERTER_INSTANCES.clear()
+
+
+def get_converter(device_type: str) -> LetPotDeviceConverter:
+    """Get the shared converter instance for a device type."""
+    if (converter := _CONVERTER_INSTANCES.get(device_type)) is not None:
+        return converter
+    for converter_class in CONVERTERS:
+        if converter_class.supports_type(device_type):
+            converter = converter_class(device_type)
+            _CONVERTER_INSTANCES[device_type] = converter
+            return converter
+    raise LetPotException("No converter available for device type")
@@ -6,21 +6,45 @@ import logging
 import os
 import ssl
 import time as systime
-from collections.abc import Coroutine
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Coroutine, Iterable, Mapping, Sequence
 from datetime import time
-from functools import wraps
+from functools import partial, wraps
 from hashlib import md5, sha256
+from itertools import islice
 from typing import Any, Callable, ParamSpec, TypeVar, cast
 
 import aiomqtt
-
-from letpot.converters import CONVERTERS, LetPotDeviceConverter
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+from letpot.backoff import BackoffPolicy
+from letpot.converters import LetPotDeviceConverter, get_converter
+from letpot.dispatch import (
+    BackpressurePolicy,
+    DispatcherStats,
+    LetPotStatusDispatcher,
+    StatusListener,
+)
 from letpot.exceptions import (
     LetPotAuthenticationException,
     LetPotConnectionException,
     LetPotException,
     LetPotFeatureException,
 )
+from letpot.history import LetPotStatusHistory
+from letpot.metrics import (
+    METRIC_CONNECT_TIME,
+    METRIC_DECODE_TIME,
+    METRIC_LISTENER_TIME,
+    METRIC_MESSAGE,
+    METRIC_RECONNECT,
+    METRIC_RECOVERY_TIME,
+    METRIC_STATUS_LATENCY,
+    DeviceClientStats,
+    MetricHook,
+    Timing,
+)
 from letpot.models import (
     AuthenticationInfo,
     DeviceFeature,
@@ -29,6 +53,14 @@ from letpot.models import (
     LightMode,
     TemperatureUnit,
 )
+from letpot.packets import (
+    HEX_CODEC,
+    LetPotPacketCache,
+    LetPotPacketReassembler,
+    PayloadCodec,
+    encode_packets,
+)
+from letpot.store import LetPotStatusStore, StoredStatus
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -77,6 +109,91 @@ def _create_ssl_context() -> ssl.SSLContext:
 
 _SSL_CONTEXT = _create_ssl_context()
 
+DEFAULT_RECONNECT_BACKOFF = BackoffPolicy(base=5, cap=600)
+"""Default delays for reconnecting to the broker."""
+
+
+@dataclasses.dataclass
+class _DeviceSubscription:
+    """Subscription to updates for a device, shared by all callbacks for the device."""
+
+    topic: str
+    qos: int
+    callbacks: list[StatusListener] = dataclasses.field(default_factory=list)
+    subscribed: asyncio.Future[None] = dataclasses.field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    """Resolved when the broker confirmed the subscription."""
+
+
+@dataclasses.dataclass
+class _PendingWrite:
+    """Update of the device status which hasn't been acknowledged by the device."""
+
+    status: LetPotDeviceStatus
+    fields: dict[str, Any]
+    acknowledged: asyncio.Future[LetPotDeviceStatus | None]
+    expire: asyncio.TimerHandle | None = None
+    published: float | None = None
+    """Monotonic time when the update was last published."""
+
+    def matches(self, status: LetPotDeviceStatus) -> bool:
+        """Returns if the status includes all updated fields."""
+        return all(
+            getattr(status, name) == value for name, value in self.fields.items()
+        )
+
+
+@dataclasses.dataclass(slots=True)
+class _DeviceState:
+    """State for a device, which can be removed if the device isn't in use."""
+
+    frame: bytes | None = None
+    """Last status message (without header), to skip identical statuses."""
+    status: LetPotDeviceStatus | None = None
+    received: float | None = None
+    """Unix timestamp when the status was received."""
+    event: asyncio.Event | None = None
+    waiters: int = 0
+    """Number of tasks waiting for the event."""
+    write: _PendingWrite | None = None
+    flush: asyncio.Task | None = None
+    history: LetPotStatusHistory | None = None
+    messages: int = 0
+    first_message: float = 0
+    """Monotonic time when the first status message was received."""
+    used: float = 0
+    """Monotonic time when the state was last used."""
+    stored: float = 0
+    """Unix timestamp of the status last written to the status store."""
+
+
+@dataclasses.dataclass
+class DeviceStateStats:
+    """Statistics for the device state kept by the device client."""
+
+    size: int
+    evicted_lru: int
+    evicted_ttl: int
+
+
+_UPDATE_FEATURES: dict[str, tuple[DeviceFeature, ...]] = {
+    "system_on": (),
+    "pump_mode": (),
+    "light_mode": (DeviceFeature.CATEGORY_HYDROPONIC_GARDEN,),
+    "plant_days": (DeviceFeature.CATEGORY_HYDROPONIC_GARDEN,),
+    "light_schedule_start": (DeviceFeature.CATEGORY_HYDROPONIC_GARDEN,),
+    "light_schedule_end": (DeviceFeature.CATEGORY_HYDROPONIC_GARDEN,),
+    "light_brightness": (
+        DeviceFeature.LIGHT_BRIGHTNESS_LOW_HIGH,
+        DeviceFeature.LIGHT_BRIGHTNESS_LEVELS,
+    ),
+    "system_sound": (DeviceFeature.CATEGORY_HYDROPONIC_GARDEN,),
+    "temperature_unit": (DeviceFeature.TEMPERATURE_SET_UNIT,),
+    "water_mode": (DeviceFeature.PUMP_AUTO,),
+}
+"""Status fields which can be updated, with the features of which one is required."""
+
 
 class LetPotDeviceClient:
     """Client for connecting to LetPot device."""
@@ -84,110 +201,391 @@ class LetPotDeviceClient:
     AUTH_ERROR_RC = [4, 5, 134, 135]
     BROKER_HOST = "broker.letpot.net"
     MTU = 128
+    SUBSCRIBE_BATCH_SIZE = 100
+    WRITE_ACK_TIMEOUT = 5
+    STATUS_STORE_INTERVAL = 60
+    DEVICE_SWEEP_INTERVAL = 10
 
     _client: aiomqtt.Client | None = None
     _client_task: asyncio.Task | None = None
     _connected: asyncio.Future[bool] | None = None
-    _topics: list[str] = []
+    _subscriptions: dict[str, _DeviceSubscription]
     _message_id: int = 0
 
     _user_id: str
     _email: str
-
-    _device_callbacks: dict[str, Callable[[LetPotDeviceStatus], None]] = {}
-    _device_status_last: dict[str, LetPotDeviceStatus | None] = {}
-    _device_status_pending: dict[str, LetPotDeviceStatus | None] = {}
-    _device_status_timeout: dict[str, asyncio.Task | None] = {}
-    _device_status_event: dict[str, asyncio.Event | None] = {}
-
-    def __init__(self, info: AuthenticationInfo) -> None:
+    _packet_cache: LetPotPacketCache
+    _reassembler: LetPotPacketReassembler
+    _dispatcher: LetPotStatusDispatcher
+
+    _devices: OrderedDict[str, _DeviceState]
+
+    def __init__(
+        self,
+        info: AuthenticationInfo,
+        *,
+        listener_queue_size: int = 100,
+        listener_backpressure: BackpressurePolicy = BackpressurePolicy.DROP_OLDEST,
+        listener_workers: int = 1,
+        write_coalesce_window: float = 0,
+        payload_codecs: Mapping[str, PayloadCodec] | None = None,
+        status_store: LetPotStatusStore | None = None,
+        stored_status_max_age: float | None = None,
+        max_devices: int | None = 1024,
+        device_ttl: float | None = None,
+        history_size: int = 0,
+        metrics_hook: MetricHook | None = None,
+        reconnect_backoff: BackoffPolicy = DEFAULT_RECONNECT_BACKOFF,
+        session_expiry: int = 300,
+    ) -> None:
+        """Initialize device client.
+
+        Status updates are passed to listeners from a queue by one or more workers,
+        see LetPotStatusDispatcher for the listener options. By default, the oldest
+        queued status is dropped when the queue is full; see BackpressurePolicy.BLOCK
+        for the limits of blocking instead.
+
+        If write_coalesce_window is set, setters don't publish immediately but wait
+        for the number of seconds to merge changes to a device into one update. Use
+        wait_for_write to wait until the update has been acknowledged by the device.
+
+        Packets are sent and received as hexadecimal text, unless payload_codecs
+        includes a different codec for the device type (first 5 serial characters).
+
+        If a status_store is provided, received statuses are stored and used when the
+        client hasn't received a status for a device yet, for example after a restart.
+        Stored statuses older than stored_status_max_age (seconds) aren't used for
+        publishing updates. Repeated identical statuses are only written to the store
+        every STATUS_STORE_INTERVAL seconds. For a blocking store (like SQLite), writes
+        are buffered and written in the background from an executor, and statuses are
+        loaded from an executor when subscribing.
+
+        State is kept for at most max_devices devices, removing the least recently
+        used device if required, and removed for devices not used for device_ttl
+        seconds. Devices with a subscription or waiting for a status are kept.
+
+        If history_size is set, the numeric fields of the latest statuses for each
+        device are kept in a history, see get_history.
+
+        Connection and latency measurements are available from stats, and are also
+        passed to the metrics_hook if provided (see letpot.metrics for the metrics).
+
+        After a connection error, the client reconnects with delays from the
+        reconnect_backoff policy. The broker keeps the session for session_expiry
+        seconds after a disconnect, and the client resumes it when reconnecting.
+        """
         self._user_id = info.user_id
         self._email = info.email
+        self._packet_cache = LetPotPacketCache(self.MTU)
+        self._reassembler = LetPotPacketReassembler()
+        self._dispatcher = LetPotStatusDispatcher(
+            self._get_listeners,
+            maxsize=listener_queue_size,
+            policy=listener_backpressure,
+            workers=listener_workers,
+            on_listener_time=(
+                None
+                if metrics_hook is None
+                else partial(self._emit_metric, METRIC_LISTENER_TIME)
+            ),
+        )
+        self._subscriptions = {}
+        self._devices = OrderedDict()
+        self._max_devices = max_devices
+        self._device_ttl = device_ttl
+        self._history_size = history_size
+        self._metrics_hook = metrics_hook
+        self._reconnect_backoff = reconnect_backoff
+        self._session_expiry = session_expiry
+        self._client_id = self._generate_client_id()
+        self._connects = 0
+        self._reconnects = 0
+        self._connect_time = Timing()
+        self._decode_time: dict[str, Timing] = {}
+        self._status_latency = Timing()
+        self._recovery_time = Timing()
+        self._evicted_lru = 0
+        self._evicted_ttl = 0
+        self._last_sweep = 0.0
+        self._duplicate_statuses = 0
+        self._status_store = status_store
+        self._stored_pending: dict[str, StoredStatus] = {}
+        self._store_task: asyncio.Task | None = None
+        self._stored_status_max_age = stored_status_max_age
+        self._write_coalesce_window = write_coalesce_window
+        self._payload_codecs = dict(payload_codecs or {})
+
+    @property
+    def listener_stats(self) -> DispatcherStats:
+        """Returns statistics for passing status updates to listeners."""
+        return self._dispatcher.stats
+
+    @property
+    def stats(self) -> DeviceClientStats:
+        """Returns statistics for the connection and messages."""
+        now = systime.monotonic()
+        return DeviceClientStats(
+            connected=self._client is not None,
+            connects=self._connects,
+            reconnects=self._reconnects,
+            connect_time=dataclasses.replace(self._connect_time),
+            message_rates={
+                serial: state.messages / max(now - state.first_message, 1)
+                for serial, state in self._devices.items()
+                if state.messages > 0
+            },
+            duplicate_statuses=self._duplicate_statuses,
+            decode_time={
+                name: dataclasses.replace(timing)
+                for name, timing in self._decode_time.items()
+            },
+            status_latency=dataclasses.replace(self._status_latency),
+            recovery_time=dataclasses.replace(self._recovery_time),
+            listeners=self._dispatcher.stats,
+        )
+
+    def _emit_metric(self, name: str, label: str | None, value: float) -> None:
+        """Pass a measurement to the metrics hook, if any."""
+        if self._metrics_hook is None:
+            return
+        try:
+            self._metrics_hook(name, value, label)
+        except Exception:  # noqa: BLE001
+            _LOGGER.warning("Exception in metrics hook, ignoring", exc_info=True)
+
+    def _record_status_latency(self, serial: str, started: float) -> None:
+        """Record the time from publishing until the device status was received."""
+        latency = systime.monotonic() - started
+        self._status_latency.record(latency)
+        self._emit_metric(METRIC_STATUS_LATENCY, serial, latency)
+
+    @property
+    def device_stats(self) -> DeviceStateStats:
+        """Returns statistics for the device state kept by the client."""
+        return DeviceStateStats(
+            size=len(self._devices),
+            evicted_lru=self._evicted_lru,
+            evicted_ttl=self._evicted_ttl,
+        )
 
     def _converter(self, serial: str) -> LetPotDeviceConverter:
         """Get the device converter for the current serial number."""
-        device_type = serial[:5]
-        for converter in CONVERTERS:
-            if converter.supports_type(device_type):
-                return converter(device_type)
-        raise LetPotException("No converter available for device type")
+        return get_converter(serial[:5])
+
+    def _codec(self, serial: str) -> PayloadCodec:
+        """Get the payload codec for the current serial number."""
+        return self._payload_codecs.get(serial[:5], HEX_CODEC)
+
+    def _device(self, serial: str) -> _DeviceState:
+        """Get the state for a device, creating it if required, and mark it as used."""
+        now = systime.monotonic()
+        if now - self._last_sweep >= self.DEVICE_SWEEP_INTERVAL:
+            self._last_sweep = now
+            self._evict_expired(now)
+        if (state := self._existing_device(serial, now)) is None:
+            self._evict_lru()
+            state = self._devices[serial] = _DeviceState()
+        else:
+            self._devices.move_to_end(serial)
+        state.used = now
+        return state
+
+    def _existing_device(
+        self, serial: str, now: float | None = None
+    ) -> _DeviceState | None:
+        """Get the state for a device without marking it as used, None if unknown or expired."""
+        if (state := self._devices.get(serial)) is None:
+            return None
+        if (
+            self._device_ttl is not None
+            and (now or systime.monotonic()) - state.used > self._device_ttl
+            and not self._device_in_use(serial, state)
+        ):
+            del self._devices[serial]
+            self._evicted_ttl += 1
+            return None
+        return state
+
+    def _device_in_use(self, serial: str, state: _DeviceState) -> bool:
+        """Returns if the device state is required for a subscription or waiting task."""
+        return (
+            serial in self._subscriptions
+            or state.write is not None
+            or state.flush is not None
+            or state.waiters > 0
+        )
+
+    def _evict_expired(self, now: float) -> None:
+        """Remove state for devices which weren't used for the device TTL."""
+        if self._device_ttl is None:
+            return
+        expired = []
+        for serial, state in self._devices.items():
+            if now - state.used <= self._device_ttl:
+                break
+            if not self._device_in_use(serial, state):
+                expired.append(serial)
+        for serial in expired:
+            del self._devices[serial]
+        self._evicted_ttl += len(expired)
+
+    def _evict_lru(self) -> None:
+        """Remove state for the least recently used devices, to add a device if full."""
+        if self._max_devices is not None:
+            excess = len(self._devices) - self._max_devices + 1
+            if excess > 0:
+                for serial in list(
+                    islice(
+                        (
+                            serial
+                            for serial, state in self._devices.items()
+                            if not self._device_in_use(serial, state)
+                        ),
+                        excess,
+                    )
+                ):
+                    del self._devices[serial]
+                    self._evicted_lru += 1
 
     # region MQTT internals
 
     def _generate_client_id(self) -> str:
-        """Generate a client identifier for the connection."""
+        """Generate a client identifier, used for all connections to resume sessions."""
         return f"LetPot_{round(systime.time() * 1000)}_{os.urandom(4).hex()[:8]}"
 
     def _generate_message_packets(
-        self, maintype: int, subtype: int, message: list[int]
-    ) -> list[str]:
-        """Convert a message to one or more packets with the message payload."""
-        length = len(message)
-        max_packet_size = self.MTU - 6
-        num_packets = (length + max_packet_size - 1) // max_packet_size
-
-        packets = []
-        for n in range(num_packets):
-            start = n * max_packet_size
-            end = min(start + max_packet_size, length)
-            payload = message[start:end]
-
-            if n < num_packets - 1:
-                packet = [
-                    (subtype << 2) | maintype,
-                    16,
-                    self._message_id,
-                    len(payload) + 4,
-                    length % 256,
-                    length // 256,
-                    *payload,
-                ]
-            else:
-                packet = [
-                    (subtype << 2) | maintype,
-                    0,
-                    self._message_id,
-                    len(payload),
-                    *payload,
-                ]
-
-            packets.append("".join(f"{byte:02x}" for byte in packet))
-            self._message_id += 1
-
+        self,
+        maintype: int,
+        subtype: int,
+        message: Sequence[int],
+        cache: bool = False,
+    ) -> list[bytearray]:
+        """Convert a message to one or more packets with the message payload.
+
+        If cache is set, the packets are encoded once for a message which doesn't
+        change and only the message id is updated for later calls.
+        """
+        packet_type = (subtype << 2) | maintype
+        if cache:
+            packets = self._packet_cache.get(
+                packet_type, bytes(message), self._message_id
+            )
+        else:
+            packets = encode_packets(packet_type, message, self._message_id, self.MTU)
+        self._message_id = (self._message_id + len(packets)) & 0xFF
         return packets
 
     def _handle_message(self, message: aiomqtt.Message) -> None:
         """Process incoming messages from the broker."""
         try:
             serial = message.topic.value.split("/")[0]
-            status = self._converter(serial).convert_hex_to_status(message.payload)
-
-            if status is not None:
-                self._device_status_pending[serial] = None
-                self._device_status_last[serial] = status
-                if (callback := self._device_callbacks.get(serial)) is not None:
-                    callback(status)
-                event = self._device_status_event.get(serial)
-                if event is not None and not event.is_set():
-                    event.set()
+            converter = self._converter(serial)
+            if not isinstance(message.payload, bytes):
+                _LOGGER.debug("Invalid message received, ignoring: %s", message.payload)
+                return
+            packet = self._codec(serial).decode(message.payload)
+            if (data := self._reassembler.add(serial, packet)) is None:
+                return
+
+            # Devices repeat identical statuses, skip decoding and passing to listeners
+            state = self._device(serial)
+            state.messages += 1
+            if state.messages == 1:
+                state.first_message = state.used
+            self._emit_metric(METRIC_MESSAGE, serial, 1)
+
+            frame = data[4:]
+            status = state.status
+            changed = status is None or frame != state.frame
+            if changed:
+                started = systime.perf_counter()
+                status = converter.convert_bytes_to_status(data)
+                duration = systime.perf_counter() - started
+                converter_name = type(converter).__name__
+                if (timing := self._decode_time.get(converter_name)) is None:
+                    timing = self._decode_time[converter_name] = Timing()
+                timing.record(duration)
+                self._emit_metric(METRIC_DECODE_TIME, converter_name, duration)
+                if status is None:
+                    return
+                state.frame = frame
+                state.status = status
+                if serial in self._subscriptions:
+                    self._dispatcher.dispatch(serial, status)
+            else:
+                assert status is not None
+                self._duplicate_statuses += 1
+            state.received = systime.time()
+            if self._history_size > 0:
+                if state.history is None:
+                    state.history = LetPotStatusHistory(self._history_size)
+                state.history.add(status, state.received)
+
+            if state.write is not None:
+                self._reconcile_write(serial, state, status)
+            if state.event is not None and not state.event.is_set():
+                state.event.set()
+
+            # Identical statuses only refresh the stored time once in a while
+            if self._status_store is not None and (
+                changed or state.received - state.stored >= self.STATUS_STORE_INTERVAL
+            ):
+                self._store_status(serial, state, data)
         except Exception:  # noqa: BLE001
             _LOGGER.warning(
                 f"Exception while handling message for {message.topic.value}, ignoring",
                 exc_info=True,
             )
 
-    async def _publish(self, serial: str, message: list[int]) -> None:
+    def _store_status(self, serial: str, state: _DeviceState, data: bytes) -> None:
+        """Write the received status to the status store, logging errors."""
+        assert self._status_store is not None and state.received is not None
+        stored = StoredStatus(bytes(data), state.received)
+        if self._status_store.blocking:
+            self._stored_pending[serial] = stored
+            if self._store_task is None:
+                self._store_task = asyncio.create_task(self._write_stored_statuses())
+        else:
+            try:
+                self._status_store.set(serial, stored)
+            except Exception:  # noqa: BLE001
+                _LOGGER.warning("Exception in status store, ignoring", exc_info=True)
+                return
+        state.stored = state.received
+
+    async def _write_stored_statuses(self) -> None:
+        """Write buffered statuses to a blocking status store, from an executor."""
+        assert self._status_store is not None
+        loop = asyncio.get_running_loop()
+        try:
+            while len(self._stored_pending) > 0:
+                statuses, self._stored_pending = self._stored_pending, {}
+                try:
+                    await loop.run_in_executor(
+                        None, self._status_store.set_many, statuses
+                    )
+                except Exception:  # noqa: BLE001
+                    _LOGGER.warning(
+                        "Exception in status store, ignoring", exc_info=True
+                    )
+        finally:
+            self._store_task = None
+
+    async def _publish(
+        self, serial: str, message: Sequence[int], cache: bool = False
+    ) -> None:
         """Publish a message to the device command topic."""
         if self._client is None:
             raise LetPotException("Missing client to publish message with")
 
-        messages = self._generate_message_packets(
-            1, 19, message
+        packets = self._generate_message_packets(
+            1, 19, message, cache
         )  # maintype 1: data, subtype 19: custom
+        codec = self._codec(serial)
         topic = f"{serial}/cmd"
         try:
-            for publish_message in messages:
-                await self._client.publish(topic, payload=publish_message)
+            for packet in packets:
+                await self._client.publish(topic, payload=codec.encode(packet))
         except aiomqtt.MqttError as err:
             if isinstance(err, aiomqtt.MqttCodeError) and err.rc in self.AUTH_ERROR_RC:
                 msg = "Publishing failed due to authentication error"
@@ -199,76 +597,209 @@ class LetPotDeviceClient:
 
     def _get_publish_status(self, serial: str) -> LetPotDeviceStatus:
         """Get the device status for publishing (pending update or latest)."""
-        if (status := self._device_status_pending.get(serial)) is not None:
-            return status
-        if (status := self._device_status_last.get(serial)) is not None:
+        if (state := self._devices.get(serial)) is not None and state.write is not None:
+            return state.write.status
+        if (
+            status := self.get_last_status(serial, self._stored_status_max_age)
+        ) is not None:
             return status
         raise LetPotException("Client doesn't have a status for publishing")
 
-    async def _clear_pending_status(self, serial: str) -> None:
-        """Clear the pending status after a timeout, to prevent an out of date status."""
-        await asyncio.sleep(5)
-        self._device_status_pending[serial] = None
-        self._device_status_timeout[serial] = None
-
-    async def _publish_status(self, serial: str, status: LetPotDeviceStatus) -> None:
-        """Set the device status."""
+    async def _load_stored_statuses(self, serials: Iterable[str]) -> None:
+        """Load the statuses for devices without a status from the status store."""
+        if self._status_store is None:
+            return
+        serials = [
+            serial
+            for serial in serials
+            if (state := self._devices.get(serial)) is None or state.status is None
+        ]
+        if len(serials) == 0:
+            return
+        try:
+            if self._status_store.blocking:
+                statuses = await asyncio.get_running_loop().run_in_executor(
+                    None, self._status_store.get_many, serials
+                )
+            else:
+                statuses = self._status_store.get_many(serials)
+        except Exception:  # noqa: BLE001
+            _LOGGER.warning("Exception in status store, ignoring", exc_info=True)
+            return
+        for serial, stored in statuses.items():
+            self._use_stored_status(serial, stored)
+
+    def _load_stored_status(self, serial: str) -> LetPotDeviceStatus | None:
+        """Load the status for a device from the status store, if available."""
+        if self._status_store is None:
+            return None
+        if (stored := self._stored_pending.get(serial)) is None and (
+            stored := self._status_store.get(serial)
+        ) is None:
+            return None
+        return self._use_stored_status(serial, stored)
+
+    def _use_stored_status(
+        self, serial: str, stored: StoredStatus
+    ) -> LetPotDeviceStatus | None:
+        """Use a status from the status store as the last known device status."""
+        status = self._converter(serial).convert_bytes_to_status(stored.raw)
+        if status is not None:
+            # Don't set the message, so the next status is passed to listeners
+            state = self._device(serial)
+            state.status = status
+            state.received = stored.received
+        return status
+
+    def _reconcile_write(
+        self, serial: str, state: _DeviceState, status: LetPotDeviceStatus
+    ) -> None:
+        """Acknowledge a pending update if the status matches, or rebase it on the status."""
+        if (write := state.write) is None:
+            return
+        if state.flush is None and write.matches(status):
+            self._finish_write(serial, write, status)
+        else:
+            write.status = dataclasses.replace(status, **write.fields)
+
+    def _finish_write(
+        self, serial: str, write: _PendingWrite, status: LetPotDeviceStatus | None
+    ) -> None:
+        """Remove a pending update, acknowledged with the status or None if expired."""
+        if (state := self._devices.get(serial)) is not None and state.write is write:
+            state.write = None
+        if write.expire is not None:
+            write.expire.cancel()
+        if not write.acknowledged.done():
+            write.acknowledged.set_result(status)
+        if status is not None and write.published is not None:
+            self._record_status_latency(serial, write.published)
+        if status is None:
+            _LOGGER.debug("Device %s didn't acknowledge the update in time", serial)
+
+    async def _publish_status(self, serial: str, fields: dict[str, Any]) -> None:
+        """Update fields of the device status, merged with unacknowledged updates.
+
+        An update which isn't acknowledged by a matching status within the timeout
+        is dropped, to prevent publishing an out of date status later.
+        """
         if self._client is None:
             raise LetPotException("Missing converter/client to publish message with")
 
-        if (task := self._device_status_timeout.get(serial)) is not None:
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
-        self._device_status_pending[serial] = status
-        self._device_status_timeout[serial] = asyncio.get_event_loop().create_task(
-            self._clear_pending_status(serial)
+        status = dataclasses.replace(self._get_publish_status(serial), **fields)
+        loop = asyncio.get_running_loop()
+        state = self._device(serial)
+        if (write := state.write) is None:
+            write = state.write = _PendingWrite(status, {}, loop.create_future())
+        else:
+            write.status = status
+        write.fields.update(fields)
+        if write.expire is not None:
+            write.expire.cancel()
+        write.expire = loop.call_later(
+            self.WRITE_ACK_TIMEOUT, self._finish_write, serial, write, None
         )
+
+        if self._write_coalesce_window <= 0:
+            await self._flush_status(serial)
+        elif state.flush is None:
+            state.flush = asyncio.create_task(
+                self._flush_status(serial, self._write_coalesce_window)
+            )
+            state.flush.add_done_callback(self._log_flush_error)
+
+    async def _flush_status(self, serial: str, delay: float = 0) -> None:
+        """Publish the pending device status, after waiting to merge changes."""
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if (state := self._devices.get(serial)) is None:
+            return
+        state.flush = None
+        if state.write is None:
+            return
+        state.write.published = systime.monotonic()
         await self._publish(
-            serial, self._converter(serial).get_update_status_message(status)
+            serial,
+            self._converter(serial).get_update_status_message(state.write.status),
         )
 
+    @staticmethod
+    def _log_flush_error(task: asyncio.Task) -> None:
+        """Log an error publishing merged changes, which has no caller to raise to."""
+        if not task.cancelled() and (err := task.exception()) is not None:
+            _LOGGER.error("Publishing merged status update failed: %s", err)
+
     async def _connect(self) -> None:
         """Connect to the broker for device communication."""
         username = f"{self._email}__letpot_v3"
         password = sha256(
             f"{self._user_id}|{md5(username.encode()).hexdigest()}".encode()
         ).hexdigest()
+        properties = None
+        if self._session_expiry > 0:
+            properties = Properties(PacketTypes.CONNECT)
+            properties.SessionExpiryInterval = self._session_expiry
         connection_attempts = 0
+        disconnected: float | None = None
         while True:
             try:
                 _LOGGER.debug("Connecting to MQTT broker")
+                connect_started = systime.monotonic()
                 async with aiomqtt.Client(
                     hostname=self.BROKER_HOST,
                     port=443,
                     username=username,
                     password=password,
-                    identifier=self._generate_client_id(),
+                    identifier=self._client_id,
                     protocol=aiomqtt.ProtocolVersion.V5,
+                    clean_start=connection_attempts == 0 or self._session_expiry <= 0,
+                    properties=properties,
                     transport="websockets",
                     tls_context=_SSL_CONTEXT,
                     tls_insecure=False,
                     websocket_path="/mqttwss",
                 ) as client:
+                    connect_time = systime.monotonic() - connect_started
+                    self._connect_time.record(connect_time)
+                    self._emit_metric(METRIC_CONNECT_TIME, None, connect_time)
+                    self._connects += 1
                     if connection_attempts >= 1:
                         _LOGGER.info("Reconnected to MQTT broker")
+                        self._reconnects += 1
+                        self._emit_metric(METRIC_RECONNECT, None, 1)
+                    if disconnected is not None:
+                        recovery_time = systime.monotonic() - disconnected
+                        self._recovery_time.record(recovery_time)
+                        self._emit_metric(METRIC_RECOVERY_TIME, None, recovery_time)
+                        disconnected = None
 
                     self._client = client
                     self._message_id = 0
                     connection_attempts = 0
 
                     # Restore active subscriptions
-                    for topic in self._topics:
-                        _LOGGER.debug(f"Restoring subscription to {topic}")
-                        await client.subscribe(topic)
+                    if len(self._subscriptions) > 0:
+                        _LOGGER.debug(
+                            f"Restoring {len(self._subscriptions)} subscription(s)"
+                        )
+                        # Subscriptions which are in progress are sent by subscribe_many
+                        await self._subscribe_topics(
+                            client,
+                            [
+                                (subscription.topic, subscription.qos)
+                                for subscription in self._subscriptions.values()
+                                if subscription.subscribed.done()
+                            ],
+                        )
 
                     if self._connected is not None and not self._connected.done():
                         self._connected.set_result(True)
 
                     async for message in client.messages:
                         self._handle_message(message)
+                        await self._dispatcher.wait_for_space()
+                        # Queued messages don't suspend, yield to other clients
+                        await asyncio.sleep(0)
             except aiomqtt.MqttError as err:
                 self._client = None
 
@@ -281,16 +812,19 @@ class LetPotDeviceClient:
                             self._connected.set_exception(auth_exception)
                         raise auth_exception from err
 
+                if disconnected is None:
+                    disconnected = systime.monotonic()
                 connection_attempts += 1
+                reconnect_interval = self._reconnect_backoff.delay(connection_attempts)
                 if connection_attempts == 1:
                     _LOGGER.info("MQTT connection error, reconnecting...: %s", err)
                 else:
-                    reconnect_interval = min((connection_attempts - 1) * 15, 600)
                     _LOGGER.debug(
-                        "MQTT connection error, retrying in %i seconds: %s",
+                        "MQTT connection error, retrying in %.1f seconds: %s",
                         reconnect_interval,
                         err,
                     )
+                if reconnect_interval > 0:
                     await asyncio.sleep(reconnect_interval)
             finally:
                 self._client = None
@@ -302,8 +836,15 @@ class LetPotDeviceClient:
                     ):  # Shutdown because task ended
                         self._connected = None
 
+    def _get_listeners(self, serial: str) -> list[StatusListener]:
+        """Get the listeners for status updates of a device."""
+        if (subscription := self._subscriptions.get(serial)) is not None:
+            return subscription.callbacks
+        return []
+
     async def _disconnect(self) -> None:
         """Cancels the active device client connection, if any."""
+        await self._dispatcher.stop()
         if self._client_task is not None:
             self._client_task.cancel()
             try:
@@ -315,10 +856,8 @@ class LetPotDeviceClient:
 
     # region (Un)subscribing
 
-    async def subscribe(
-        self, serial: str, callback: Callable[[LetPotDeviceStatus], None]
-    ) -> None:
-        """Subscribe to devices updates, connecting to the device client and waiting for connection if required."""
+    async def _ensure_connected(self) -> None:
+        """Connect to the device client and wait for connection, if required."""
         if (
             self._connected is None
             or self._connected.cancelled()
@@ -336,32 +875,162 @@ class LetPotDeviceClient:
         elif not self._connected.done():
             await self._connected
 
-        try:
-            assert self._client is not None
-            topic = f"{serial}/data"
+    async def _subscribe_topics(
+        self, client: aiomqtt.Client, topics: list[tuple[str, int]]
+    ) -> None:
+        """Subscribe to (topic, QoS) pairs, sending batches of topics in one packet each."""
+        batch_size = self.SUBSCRIBE_BATCH_SIZE
+        await asyncio.gather(
+            *(
+                client.subscribe(topics[n : n + batch_size])
+                for n in range(0, len(topics), batch_size)
+            )
+        )
 
-            _LOGGER.debug(f"Subscribing to {topic}")
-            await self._client.subscribe(topic)
-            self._topics.append(topic)
-            self._device_callbacks[serial] = callback
-        except aiomqtt.MqttError as err:
-            if len(self._topics) == 0:
+    async def _unsubscribe_topics(
+        self, client: aiomqtt.Client, topics: list[str]
+    ) -> None:
+        """Unsubscribe from topics, sending batches of topics in one packet each."""
+        batch_size = self.SUBSCRIBE_BATCH_SIZE
+        await asyncio.gather(
+            *(
+                client.unsubscribe(topics[n : n + batch_size])
+                for n in range(0, len(topics), batch_size)
+            )
+        )
+
+    async def subscribe(
+        self,
+        serial: str,
+        callback: StatusListener,
+        qos: int = 0,
+    ) -> None:
+        """Subscribe to devices updates, connecting to the device client and waiting for connection if required."""
+        await self.subscribe_many([serial], callback, qos)
+
+    async def subscribe_many(
+        self,
+        serials: Iterable[str],
+        callback: StatusListener,
+        qos: int = 0,
+    ) -> None:
+        """Subscribe to updates for multiple devices at once, connecting to the device client and waiting for connection if required.
+
+        Subscribing to a device more than once adds the callback to the existing
+        subscription, which remains until it is unsubscribed from as often.
+        """
+        serials = list(dict.fromkeys(serials))
+        # Register new subscriptions before waiting, so concurrent calls share them
+        new_subscriptions = {
+            serial: _DeviceSubscription(topic=f"{serial}/data", qos=qos)
+            for serial in serials
+            if serial not in self._subscriptions
+        }
+        self._subscriptions.update(new_subscriptions)
+        pending = [
+            self._subscriptions[serial].subscribed
+            for serial in serials
+            if serial not in new_subscriptions
+        ]
+        for serial in serials:
+            self._subscriptions[serial].callbacks.append(callback)
+            # Pass the next status to the new callback, even if it is identical
+            if (state := self._devices.get(serial)) is not None:
+                state.frame = None
+
+        try:
+            if len(new_subscriptions) > 0:
+                await self._ensure_connected()
+                assert self._client is not None
+                _LOGGER.debug(f"Subscribing to {len(new_subscriptions)} device(s)")
+                await self._subscribe_topics(
+                    self._client,
+                    [
+                        (subscription.topic, qos)
+                        for subscription in new_subscriptions.values()
+                    ],
+                )
+                for subscription in new_subscriptions.values():
+                    subscription.subscribed.set_result(None)
+            # Wait for concurrent calls which are subscribing to the other devices
+            await asyncio.gather(*pending)
+        except BaseException as err:
+            for serial in serials:
+                if (existing := self._subscriptions.get(serial)) is None:
+                    continue
+                if new_subscriptions.get(serial) is existing:
+                    del self._subscriptions[serial]
+                elif callback in existing.callbacks:
+                    existing.callbacks.remove(callback)
+            for subscription in new_subscriptions.values():
+                if subscription.subscribed.done():
+                    continue
+                if isinstance(err, Exception):
+                    subscription.subscribed.set_exception(err)
+                    subscription.subscribed.exception()  # Mark as retrieved
+                else:
+                    subscription.subscribed.cancel()
+            if isinstance(err, aiomqtt.MqttError) and len(self._subscriptions) == 0:
                 await self._disconnect()
-            raise err
+            raise
+        await self._load_stored_statuses(new_subscriptions)
 
-    async def unsubscribe(self, serial: str) -> None:
+    async def unsubscribe(
+        self,
+        serial: str,
+        callback: StatusListener | None = None,
+    ) -> None:
         """Unsubscribes from device updates, and cancels the active device client connection if required."""
-        topic = f"{serial}/data"
-        if topic in self._topics:
-            _LOGGER.debug(f"Unsubscribing from {topic}")
-            if self._client is not None:
-                await self._client.unsubscribe(topic)
-            self._topics.remove(topic)
-            self._device_callbacks.pop(serial, None)
-
-            if len(self._topics) == 0:
-                _LOGGER.debug("Disconnecting because no more topics remain")
-                await self._disconnect()
+        await self.unsubscribe_many([serial], callback)
+
+    async def unsubscribe_many(
+        self,
+        serials: Iterable[str],
+        callback: StatusListener | None = None,
+    ) -> None:
+        """Unsubscribes from updates for multiple devices at once, and cancels the active device client connection if required.
+
+        Removes the callback (or the most recent callback if not provided) from the
+        subscription for each device, and unsubscribes when no callbacks remain.
+        """
+        removed = []
+        for serial in dict.fromkeys(serials):
+            if (subscription := self._subscriptions.get(serial)) is None:
+                continue
+            if callback is None:
+                subscription.callbacks.pop()
+            elif callback in subscription.callbacks:
+                subscription.callbacks.remove(callback)
+            if len(subscription.callbacks) == 0:
+                removed.append(serial)
+        if len(removed) == 0:
+            return
+
+        for serial in removed:
+            self._dispatcher.forget(serial)
+        topics = [self._subscriptions.pop(serial).topic for serial in removed]
+        _LOGGER.debug(f"Unsubscribing from {len(removed)} device(s)")
+        if self._client is not None:
+            await self._unsubscribe_topics(self._client, topics)
+
+        if len(self._subscriptions) == 0:
+            _LOGGER.debug("Disconnecting because no more topics remain")
+            await self._disconnect()
+
+    async def disconnect(self) -> None:
+        """Unsubscribes from updates for all devices, and cancels the active device client connection."""
+        for serial in self._subscriptions:
+            self._dispatcher.forget(serial)
+        topics = [subscription.topic for subscription in self._subscriptions.values()]
+        self._subscriptions.clear()
+        if self._client is not None and len(topics) > 0:
+            try:
+                await self._unsubscribe_topics(self._client, topics)
+            except aiomqtt.MqttError as err:
+                _LOGGER.debug("Unsubscribing before disconnecting failed: %s", err)
+        await self._disconnect()
+        if self._store_task is not None:
+            await self._store_task
 
     # endregion
 
@@ -382,19 +1051,165 @@ class LetPotDeviceClient:
         """Get the light brightness levels for this device."""
         return self._converter(serial).get_light_brightness_levels()
 
+    def get_last_status(
+        self, serial: str, max_age: float | None = None
+    ) -> LetPotDeviceStatus | None:
+        """Get the last known device status, loaded from the status store if required.
+
+        Returns None if no status is known or it is older than max_age (seconds).
+        """
+        state = self._existing_device(serial)
+        if (status := None if state is None else state.status) is None:
+            status = self._load_stored_status(serial)
+        if status is None:
+            return None
+        if max_age is not None and (self.get_last_status_age(serial) or 0) > max_age:
+            return None
+        return status
+
+    def get_last_status_age(self, serial: str) -> float | None:
+        """Get the number of seconds since the last known device status was received.
+
+        Returns None if the time is unknown.
+        """
+        state = self._existing_device(serial)
+        if state is None or (received := state.received) is None:
+            return None
+        return max(systime.time() - received, 0)
+
+    def get_history(self, serial: str) -> LetPotStatusHistory | None:
+        """Get the history of received statuses for this device, if enabled."""
+        if (state := self._existing_device(serial)) is None:
+            return None
+        return state.history
+
     async def request_status_update(self, serial: str) -> None:
         """Request the device to send the current device status."""
         await self._publish(
-            serial, self._converter(serial).get_current_status_message()
+            serial, self._converter(serial).get_current_status_message(), cache=True
         )
 
-    async def get_current_status(self, serial: str) -> LetPotDeviceStatus | None:
-        """Request an update of and return the current device status."""
-        status_event = asyncio.Event()
-        self._device_status_event[serial] = status_event
-        await self.request_status_update(serial)
-        await status_event.wait()
-        return self._device_status_last.get(serial)
+    async def get_current_status(
+        self, serial: str, timeout: float | None = None
+    ) -> LetPotDeviceStatus | None:
+        """Request an update of and return the current device status.
+
+        Returns None if the device doesn't respond within the timeout (seconds).
+        """
+        state = self._device(serial)
+        if (status_event := state.event) is None or status_event.is_set():
+            status_event = state.event = asyncio.Event()
+        started = systime.monotonic()
+        state.waiters += 1
+        try:
+            await self.request_status_update(serial)
+            async with asyncio.timeout(timeout):
+                await status_event.wait()
+        except TimeoutError:
+            _LOGGER.debug("Device %s didn't respond with a status in time", serial)
+            return None
+        finally:
+            state.waiters -= 1
+            if state.waiters == 0 and state.event is status_event:
+                state.event = None
+        self._record_status_latency(serial, started)
+        return state.status
+
+    async def iter_current_statuses(
+        self, serials: Iterable[str], timeout: float = 10, concurrency: int = 50
+    ) -> AsyncIterator[tuple[str, LetPotDeviceStatus | None]]:
+        """Request an update of the current device status for multiple devices, yielding (serial, status) as they arrive.
+
+        At most concurrency requests are waiting for a status at the same time. The
+        status is None if the device doesn't respond within the timeout (seconds), or
+        if requesting the status failed.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def get_status(serial: str) -> tuple[str, LetPotDeviceStatus | None]:
+            async with semaphore:
+                try:
+                    return serial, await self.get_current_status(serial, timeout)
+                except LetPotException as err:
+                    _LOGGER.warning("Requesting status for %s failed: %s", serial, err)
+                    return serial, None
+
+        tasks = [asyncio.create_task(get_status(serial)) for serial in set(serials)]
+        try:
+            for next_status in asyncio.as_completed(tasks):
+                yield await next_status
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_current_statuses(
+        self, serials: Iterable[str], timeout: float = 10, concurrency: int = 50
+    ) -> dict[str, LetPotDeviceStatus | None]:
+        """Request an update of and return the current device status for multiple devices.
+
+        The status is None for devices which don't respond within the timeout, or for
+        which requesting the status failed.
+        """
+        return {
+            serial: status
+            async for serial, status in self.iter_current_statuses(
+                serials, timeout, concurrency
+            )
+        }
+
+    async def wait_for_write(
+        self, serial: str, timeout: float | None = None
+    ) -> LetPotDeviceStatus | None:
+        """Wait until changes to the device status have been acknowledged by the device.
+
+        Merged changes waiting to be published are published first, raising any error.
+        Returns the device status reported after the update, or None if there are no
+        changes to wait for or the device doesn't respond within the timeout (seconds).
+        """
+        if (state := self._devices.get(serial)) is None:
+            return None
+        if state.flush is not None:
+            await asyncio.shield(state.flush)
+        if (write := state.write) is None:
+            return None
+        try:
+            async with asyncio.timeout(timeout):
+                return await asyncio.shield(write.acknowledged)
+        except TimeoutError:
+            _LOGGER.debug("Device %s didn't acknowledge the update in time", serial)
+            return None
+
+    async def update(
+        self, serial: str, *, timeout: float | None = None, **fields: Any
+    ) -> LetPotDeviceStatus | None:
+        """Update multiple fields of the device status at once, in a single update.
+
+        All fields are validated before publishing. Returns the device status which
+        acknowledges the update, or None if the device doesn't report a matching
+        status within the timeout (seconds, at most WRITE_ACK_TIMEOUT).
+        """
+        try:
+            supported_features = self._converter(serial).supported_features()
+        except LetPotException as err:
+            raise LetPotFeatureException("Device type isn't supported") from err
+        for name, value in fields.items():
+            if (required_feature := _UPDATE_FEATURES.get(name)) is None:
+                raise LetPotException(f"Unable to update status field {name}")
+            if required_feature and not any(
+                feature in supported_features for feature in required_feature
+            ):
+                raise LetPotFeatureException(
+                    f"Device missing required feature for {name}: {required_feature}"
+                )
+        if "light_brightness" in fields and fields[
+            "light_brightness"
+        ] not in self.get_light_brightness_levels(serial):
+            raise LetPotFeatureException(
+                f"Device doesn't support setting light brightness to {fields['light_brightness']}"
+            )
+
+        await self._publish_status(serial, fields)
+        return await self.wait_for_write(serial, timeout)
 
     @requires_feature(
         DeviceFeature.LIGHT_BRIGHTNESS_LOW_HIGH, DeviceFeature.LIGHT_BRIGHTNESS_LEVELS
@@ -406,70 +1221,98 @@ class LetPotDeviceClient:
                 f"Device doesn't support setting light brightness to {level}"
             )
 
-        status = dataclasses.replace(
-            self._get_publish_status(serial), light_brightness=level
-        )
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"light_brightness": level})
 
     @requires_feature(DeviceFeature.CATEGORY_HYDROPONIC_GARDEN)
     async def set_light_mode(self, serial: str, mode: LightMode) -> None:
         """Set the light mode for this device (flower/vegetable)."""
-        status = dataclasses.replace(self._get_publish_status(serial), light_mode=mode)
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"light_mode": mode})
 
     @requires_feature(DeviceFeature.CATEGORY_HYDROPONIC_GARDEN)
     async def set_light_schedule(
         self, serial: str, start: time | None, end: time | None
     ) -> None:
         """Set the light schedule for this device (start time and/or end time)."""
-        use_status = self._get_publish_status(serial)
-        start_time = use_status.light_schedule_start if start is None else start
-        end_time = use_status.light_schedule_end if end is None else end
-        status = dataclasses.replace(
-            use_status,
-            light_schedule_start=start_time,
-            light_schedule_end=end_time,
-        )
-        await self._publish_status(serial, status)
+        fields: dict[str, Any] = {}
+        if start is not None:
+            fields["light_schedule_start"] = start
+        if end is not None:
+            fields["light_schedule_end"] = end
+        await self._publish_status(serial, fields)
 
     @requires_feature(DeviceFeature.CATEGORY_HYDROPONIC_GARDEN)
     async def set_plant_days(self, serial: str, days: int) -> None:
         """Set the plant days counter for this device (number of days)."""
-        status = dataclasses.replace(self._get_publish_status(serial), plant_days=days)
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"plant_days": days})
 
     async def set_power(self, serial: str, on: bool) -> None:
         """Set the general power for this device (on/off)."""
-        status = dataclasses.replace(self._get_publish_status(serial), system_on=on)
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"system_on": on})
 
     async def set_pump_mode(self, serial: str, on: bool) -> None:
         """Set the pump mode for this device (on (scheduled)/off)."""
-        status = dataclasses.replace(
-            self._get_publish_status(serial), pump_mode=1 if on else 0
-        )
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"pump_mode": 1 if on else 0})
 
     @requires_feature(DeviceFeature.CATEGORY_HYDROPONIC_GARDEN)
     async def set_sound(self, serial: str, on: bool) -> None:
         """Set the alarm sound for this device (on/off)."""
-        status = dataclasses.replace(self._get_publish_status(serial), system_sound=on)
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"system_sound": on})
 
     @requires_feature(DeviceFeature.TEMPERATURE_SET_UNIT)
     async def set_temperature_unit(self, serial: str, unit: TemperatureUnit) -> None:
         """Set the temperature unit for this device (Celsius/Fahrenheit)."""
-        status = dataclasses.replace(
-            self._get_publish_status(serial), temperature_unit=unit
-        )
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"temperature_unit": unit})
 
     @requires_feature(DeviceFeature.PUMP_AUTO)
     async def set_water_mode(self, serial: str, on: bool) -> None:
         """Set the automatic water/nutrient mode for this device (on/off)."""
-        status = dataclasses.replace(
-            self._get_publish_status(serial), water_mode=1 if on else 0
-        )
-        await self._publish_status(serial, status)
+        await self._publish_status(serial, {"water_mode": 1 if on else 0})
 
     # endregion
+
+
+class LetPotDeviceClientPool:
+    """Device clients for multiple accounts, with a broker connection per account.
+
+    The broker credentials are derived from the account, so every account uses
+    a separate connection with its own connection loop and device state.
+    """
+
+    _clients: dict[str, LetPotDeviceClient]
+
+    def __init__(self, **client_options: Any) -> None:
+        """Initialize pool, the client_options are passed to every device client."""
+        self._clients = {}
+        self._client_options = client_options
+
+    def __len__(self) -> int:
+        """Returns the number of accounts in the pool."""
+        return len(self._clients)
+
+    def client(self, info: AuthenticationInfo) -> LetPotDeviceClient:
+        """Get the device client for an account, creating it if required."""
+        if (client := self._clients.get(info.user_id)) is None:
+            client = self._clients[info.user_id] = LetPotDeviceClient(
+                info, **self._client_options
+            )
+        return client
+
+    async def subscribe(
+        self,
+        info: AuthenticationInfo,
+        serial: str,
+        callback: StatusListener,
+    ) -> LetPotDeviceClient:
+        """Subscribe to device updates for an account, returns the device client."""
+        client = self.client(info)
+        await client.subscribe(serial, callback)
+        return client
+
+    async def remove(self, user_id: str) -> None:
+        """Remove an account from the pool, disconnecting its device client."""
+        if (client := self._clients.pop(user_id, None)) is not None:
+            await client.disconnect()
+
+    async def disconnect(self) -> None:
+        """Remove all accounts from the pool, disconnecting all device clients."""
+        await asyncio.gather(*(self.remove(user_id) for user_id in list(self._clients)))
@@ -0,0 +1,268 @@
+"""Status dispatching for Python client for LetPot hydroponic gardens."""
+
+import asyncio
+import inspect
+import logging
+import time as systime
+from collections import deque
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from enum import StrEnum
+
+from letpot.models import LetPotDeviceStatus
+
+_LOGGER = logging.getLogger(__name__)
+
+StatusChangeCallback = Callable[
+    [LetPotDeviceStatus, frozenset[str]], None | Awaitable[None]
+]
+"""Callback for device status changes, called with the names of the changed fields."""
+
+
+@dataclass(frozen=True)
+class ChangeListener:
+    """Listener which is only called if fields of the device status changed.
+
+    The callback receives the status and the names of the fields which changed
+    compared to the previous status for the device passed to listeners. Listeners
+    with the same callback and fields are equal, for unsubscribing.
+    """
+
+    callback: StatusChangeCallback
+    fields: frozenset[str] | None = None
+    """Only call the callback if one of these fields changed (any field if None)."""
+
+
+StatusListener = Callable[[LetPotDeviceStatus], None | Awaitable[None]] | ChangeListener
+"""Listener for device status updates, either a function or coroutine function."""
+
+
+class BackpressurePolicy(StrEnum):
+    """Policy for status updates when a dispatch queue is full."""
+
+    BLOCK = "block"
+    """Stop receiving messages until there is space in the queue.
+
+    The MQTT client keeps receiving and queueing messages without a limit in the
+    meantime, so this doesn't limit memory use. Listeners must not wait for a status
+    (get_current_status, update) with a full queue, as that status can only be
+    received when there is space in the queue.
+    """
+    COALESCE_LATEST = "coalesce_latest"
+    """Replace a queued status for the same device, or drop the oldest status."""
+    DROP_OLDEST = "drop_oldest"
+    """Drop the oldest queued status."""
+
+
+@dataclass
+class DispatcherStats:
+    """Statistics for status dispatching to listeners."""
+
+    queue_depth: int
+    max_queue_depth: int
+    dispatched: int
+    dropped: int
+    coalesced: int
+    listener_calls: int
+    listener_errors: int
+    listener_time_total: float
+    listener_time_max: float
+
+
+class _Shard:
+    """Queue of status updates for a subset of devices, handled by one worker."""
+
+    def __init__(self) -> None:
+        self.items: deque[tuple[str, LetPotDeviceStatus | None]] = deque()
+        self.latest: dict[str, LetPotDeviceStatus] = {}
+        self.wakeup = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+        self.task: asyncio.Task | None = None
+
+
+class LetPotStatusDispatcher:
+    """Dispatches status updates to listeners using bounded queues and workers.
+
+    Devices are divided over the workers by serial, so status updates for a
+    device are always handled in order by the same worker.
+    """
+
+    def __init__(
+        self,
+        get_listeners: Callable[[str], Sequence[StatusListener]],
+        maxsize: int = 100,
+        policy: BackpressurePolicy = BackpressurePolicy.DROP_OLDEST,
+        workers: int = 1,
+        on_listener_time: Callable[[str, float], None] | None = None,
+    ) -> None:
+        """Initialize dispatcher.
+
+        Args:
+            get_listeners: function returning the current listeners for a serial.
+            maxsize: the maximum number of queued status updates per worker.
+            policy: the policy for status updates when a queue is full.
+            workers: the number of workers calling listeners.
+            on_listener_time: function called with the serial and duration (seconds)
+                after calling a listener.
+        """
+        self.maxsize = maxsize
+        self.policy = policy
+        self._get_listeners = get_listeners
+        self._on_listener_time = on_listener_time
+        self._shards = [_Shard() for _ in range(workers)]
+        self._previous: dict[str, LetPotDeviceStatus] = {}
+        self._unfinished = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self._max_queue_depth = 0
+        self._dispatched = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._listener_calls = 0
+        self._listener_errors = 0
+        self._listener_time_total = 0.0
+        self._listener_time_max = 0.0
+
+    @property
+    def stats(self) -> DispatcherStats:
+        """Returns the current dispatch statistics."""
+        return DispatcherStats(
+            queue_depth=sum(len(shard.items) for shard in self._shards),
+            max_queue_depth=self._max_queue_depth,
+            dispatched=self._dispatched,
+            dropped=self._dropped,
+            coalesced=self._coalesced,
+            listener_calls=self._listener_calls,
+            listener_errors=self._listener_errors,
+            listener_time_total=self._listener_time_total,
+            listener_time_max=self._listener_time_max,
+        )
+
+    def dispatch(self, serial: str, status: LetPotDeviceStatus) -> None:
+        """Queue a status update for the listeners of a device."""
+        shard = self._shards[hash(serial) % len(self._shards)]
+        if shard.task is None:
+            shard.task = asyncio.create_task(self._run(shard))
+        self._dispatched += 1
+
+        if self.policy is BackpressurePolicy.COALESCE_LATEST:
+            if serial in shard.latest:
+                shard.latest[serial] = status
+                self._coalesced += 1
+                return
+            shard.latest[serial] = status
+            item: tuple[str, LetPotDeviceStatus | None] = (serial, None)
+        else:
+            item = (serial, status)
+
+        if len(shard.items) >= self.maxsize:
+            if self.policy is BackpressurePolicy.BLOCK:
+                shard.space.clear()
+            else:
+                dropped_serial, dropped_status = shard.items.popleft()
+                if dropped_status is None:
+                    del shard.latest[dropped_serial]
+                self._dropped += 1
+                self._task_done()
+        shard.items.append(item)
+        self._unfinished += 1
+        self._idle.clear()
+        self._max_queue_depth = max(self._max_queue_depth, len(shard.items))
+        shard.wakeup.set()
+
+    async def wait_for_space(self) -> None:
+        """Wait until there is space in all queues (only blocks for policy BLOCK)."""
+        for shard in self._shards:
+            await shard.space.wait()
+
+    async def join(self) -> None:
+        """Wait until all queued status updates have been handled."""
+        await self._idle.wait()
+
+    async def stop(self) -> None:
+        """Stop all workers, dropping queued status updates.
+
+        If called from a listener, its worker stops after the listener returns.
+        """
+        current = asyncio.current_task()
+        tasks = [
+            shard.task
+            for shard in self._shards
+            if shard.task is not None and shard.task is not current
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for shard in self._shards:
+            shard.task = None
+            shard.items.clear()
+            shard.latest.clear()
+            shard.space.set()
+        self._unfinished = 0
+        self._idle.set()
+
+    def forget(self, serial: str) -> None:
+        """Forget the previous status for a device, used to find changed fields."""
+        self._previous.pop(serial, None)
+
+    def _task_done(self) -> None:
+        """Mark a queued status update as handled."""
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._idle.set()
+
+    async def _run(self, shard: _Shard) -> None:
+        """Worker handling the queued status updates for a shard, until stopped."""
+        task = asyncio.current_task()
+        while shard.task is task:
+            while len(shard.items) == 0:
+                shard.wakeup.clear()
+                await shard.wakeup.wait()
+            serial, status = shard.items.popleft()
+            if status is None:
+                status = shard.latest.pop(serial)
+            if len(shard.items) < self.maxsize:
+                shard.space.set()
+            try:
+                await self._call_listeners(serial, status)
+            finally:
+                # Queued updates were already dropped if stopped by a listener
+                if shard.task is task:
+                    self._task_done()
+
+    async def _call_listeners(self, serial: str, status: LetPotDeviceStatus) -> None:
+        """Call all listeners for a device with the status update."""
+        listeners = tuple(self._get_listeners(serial))
+        changed: frozenset[str] = frozenset()
+        if any(isinstance(listener, ChangeListener) for listener in listeners):
+            changed = status.changed_fields(self._previous.get(serial))
+        for listener in listeners:
+            if isinstance(listener, ChangeListener):
+                if not changed or (
+                    listener.fields is not None and listener.fields.isdisjoint(changed)
+                ):
+                    continue
+            start = systime.perf_counter()
+            try:
+                if isinstance(listener, ChangeListener):
+                    result = listener.callback(status, changed)
+                else:
+                    result = listener(status)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # noqa: BLE001
+                self._listener_errors += 1
+                _LOGGER.warning(
+                    f"Exception in status listener for {serial}, ignoring",
+                    exc_info=True,
+                )
+            finally:
+                duration = systime.perf_counter() - start
+                self._listener_calls += 1
+                self._listener_time_total += duration
+                self._listener_time_max = max(self._listener_time_max, duration)
+                if self._on_listener_time is not None:
+                    self._on_listener_time(serial, duration)
+        self._previous[serial] = status
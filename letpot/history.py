@@ -0,0 +1,138 @@
+"""Status history for Python client for LetPot hydroponic gardens."""
+
+import math
+import time as systime
+from array import array
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+from letpot.models import LetPotDeviceErrors, LetPotDeviceStatus
+
+HISTORY_FIELDS = (
+    "temperature_value",
+    "water_level",
+    "light_brightness",
+    "pump_status",
+    "errors",
+)
+"""Numeric status fields kept in the history."""
+
+ERROR_BITS = {
+    "low_water": 1,
+    "low_nutrients": 2,
+    "pump_malfunction": 4,
+    "refill_error": 8,
+}
+"""Bits for the errors in the history "errors" value."""
+
+
+def _encode_errors(errors: LetPotDeviceErrors) -> int:
+    """Encodes the device errors as bits, see ERROR_BITS."""
+    return sum(bit for name, bit in ERROR_BITS.items() if getattr(errors, name))
+
+
+@dataclass(frozen=True, slots=True)
+class HistoryBucket:
+    """Aggregated values of a status field for a period."""
+
+    start: float
+    """Unix timestamp of the start of the period."""
+    count: int
+    min: float
+    max: float
+    mean: float
+
+
+class LetPotStatusHistory:
+    """Ring buffer with the numeric fields of the latest statuses for a device.
+
+    Values are stored in typed arrays with a timestamp, missing values (not supported
+    by the device) as NaN. When full, the oldest values are overwritten.
+    """
+
+    def __init__(self, size: int = 1440) -> None:
+        """Initialize history for at most size statuses."""
+        self.size = size
+        self._timestamps = array("d", bytes(8 * size))
+        self._values = {name: array("f", [math.nan]) * size for name in HISTORY_FIELDS}
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        """Returns the number of statuses in the history."""
+        return self._count
+
+    def add(self, status: LetPotDeviceStatus, timestamp: float | None = None) -> None:
+        """Add the values of a status, received at the timestamp (default now)."""
+        index = self._next
+        self._timestamps[index] = systime.time() if timestamp is None else timestamp
+        for name in HISTORY_FIELDS:
+            if name == "errors":
+                value: float | None = _encode_errors(status.errors)
+            else:
+                value = getattr(status, name)
+            self._values[name][index] = math.nan if value is None else value
+        self._next = (index + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def _indices(self, start: float | None, end: float | None) -> Iterator[int]:
+        """Yields the indices of statuses in the period, from oldest to newest."""
+        first = (self._next - self._count) % self.size
+        for n in range(self._count):
+            index = (first + n) % self.size
+            timestamp = self._timestamps[index]
+            if start is not None and timestamp < start:
+                continue
+            if end is not None and timestamp >= end:
+                break
+            yield index
+
+    def values(
+        self, field: str, start: float | None = None, end: float | None = None
+    ) -> list[tuple[float, float]]:
+        """Returns (timestamp, value) for a field in the period, skipping missing values."""
+        values = self._values[field]
+        return [
+            (self._timestamps[index], values[index])
+            for index in self._indices(start, end)
+            if not math.isnan(values[index])
+        ]
+
+    def aggregate(
+        self,
+        field: str,
+        interval: float,
+        start: float | None = None,
+        end: float | None = None,
+    ) -> list[HistoryBucket]:
+        """Returns the min/max/mean for a field per interval (seconds) in the period.
+
+        Periods are aligned to multiples of the interval, periods without values
+        are left out.
+        """
+        buckets = []
+        bucket_start: float | None = None
+        count = 0
+        total = minimum = maximum = 0.0
+        for timestamp, value in self.values(field, start, end):
+            value_start = timestamp - timestamp % interval
+            if value_start != bucket_start:
+                if bucket_start is not None:
+                    buckets.append(
+                        HistoryBucket(
+                            bucket_start, count, minimum, maximum, total / count
+                        )
+                    )
+                bucket_start = value_start
+                count = 0
+                total = 0.0
+                minimum = maximum = value
+            count += 1
+            total += value
+            minimum = min(minimum, value)
+            maximum = max(maximum, value)
+        if bucket_start is not None:
+            buckets.append(
+                HistoryBucket(bucket_start, count, minimum, maximum, total / count)
+            )
+        return buckets
@@ -0,0 +1,81 @@
+"""Metrics for Python client for LetPot hydroponic gardens."""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from letpot.dispatch import DispatcherStats
+
+MetricHook = Callable[[str, float, str | None], None]
+"""Hook called for every measurement with the metric name, value and label.
+
+The label is the device serial, converter name or None, depending on the metric.
+"""
+
+METRIC_CONNECT_TIME = "connect_time"
+"""Seconds to connect to the broker, label None."""
+METRIC_RECONNECT = "reconnect"
+"""Reconnected to the broker (value 1), label None."""
+METRIC_RECOVERY_TIME = "recovery_time"
+"""Seconds from a connection error until reconnected to the broker, label None."""
+METRIC_MESSAGE = "message"
+"""Status message received (value 1), label device serial."""
+METRIC_DECODE_TIME = "decode_time"
+"""Seconds to decode a status message, label converter name."""
+METRIC_STATUS_LATENCY = "status_latency"
+"""Seconds from publishing an update or status request until the device status
+was received, label device serial."""
+METRIC_LISTENER_TIME = "listener_time"
+"""Seconds for calling a status listener, label device serial."""
+
+
+@dataclass
+class Timing:
+    """Aggregated durations (seconds) for a measurement."""
+
+    count: int = 0
+    total: float = 0
+    max: float = 0
+
+    @property
+    def mean(self) -> float:
+        """Returns the mean duration, or 0 if there are no measurements."""
+        return self.total / self.count if self.count > 0 else 0
+
+    def record(self, value: float) -> None:
+        """Add a duration to the aggregate."""
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+
+@dataclass
+class DeviceClientStats:
+    """Statistics for the connection and messages of a device client."""
+
+    connected: bool
+    connects: int
+    reconnects: int
+    connect_time: Timing
+    message_rates: dict[str, float]
+    """Status messages per second for each device, since the first message."""
+    duplicate_statuses: int
+    """Status messages which were identical to the previous status, and skipped."""
+    decode_time: dict[str, Timing]
+    """Time to decode status messages, for each converter."""
+    status_latency: Timing
+    recovery_time: Timing
+    """Time from a connection error until reconnected to the broker."""
+    listeners: DispatcherStats
+
+
+@dataclass
+class RequestStats:
+    """Counters for requests to the API."""
+
+    requests: int = 0
+    """Requests sent, including retries."""
+    retries: int = 0
+    failures: int = 0
+    """Requests which still failed with a transient error after retrying."""
+    short_circuits: int = 0
+    """Requests which were not sent because the circuit breaker was open."""
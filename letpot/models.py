@@ -1,7 +1,7 @@
 """Models for Python client for LetPot hydroponic gardens."""
 
 import time as systime
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import time
 from enum import IntEnum, IntFlag, auto
 
@@ -66,6 +66,46 @@ class LetPotDevice:
     is_remote: bool | None
 
 
+@dataclass
+class LetPotDeviceChanges:
+    """Changes to the devices connected to the user, between two device lists."""
+
+    added: list[LetPotDevice]
+    removed: list[LetPotDevice]
+    renamed: list[LetPotDevice]
+    online_changed: list[LetPotDevice]
+    """Devices which came online or went offline."""
+
+    def __bool__(self) -> bool:
+        """Returns if there are any changes."""
+        return bool(self.added or self.removed or self.renamed or self.online_changed)
+
+    @classmethod
+    def compare(
+        cls, previous: list[LetPotDevice], current: list[LetPotDevice]
+    ) -> "LetPotDeviceChanges":
+        """Returns the changes from the previous to the current devices.
+
+        Changed devices are listed with their current values.
+        """
+        old = {device.serial_number: device for device in previous}
+        new = {device.serial_number: device for device in current}
+        return cls(
+            added=[device for serial, device in new.items() if serial not in old],
+            removed=[device for serial, device in old.items() if serial not in new],
+            renamed=[
+                device
+                for serial, device in new.items()
+                if serial in old and old[serial].name != device.name
+            ],
+            online_changed=[
+                device
+                for serial, device in new.items()
+                if serial in old and old[serial].is_online != device.is_online
+            ],
+        )
+
+
 @dataclass
 class LetPotDeviceInfo:
     """Information about a device model, based on the serial number."""
@@ -76,7 +116,7 @@ class LetPotDeviceInfo:
     features: DeviceFeature
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class LetPotDeviceErrors:
     """Device errors model. Errors not supported by the device will be None."""
 
@@ -86,7 +126,7 @@ class LetPotDeviceErrors:
     refill_error: bool | None = None
 
 
-@dataclass
+@dataclass(slots=True)
 class LetPotDeviceStatus:
     """Device status model."""
 
@@ -107,3 +147,22 @@ class LetPotDeviceStatus:
     temperature_value: int | None = None
     water_mode: int | None = None
     water_level: int | None = None
+
+    def changed_fields(self, previous: "LetPotDeviceStatus | None") -> frozenset[str]:
+        """Returns the names of fields which differ from the previous status (all if None).
+
+        The raw message isn't compared, it includes a message id which changes.
+        """
+        if previous is None:
+            return _STATUS_FIELDS
+        return frozenset(
+            name
+            for name in _STATUS_FIELDS
+            if getattr(self, name) != getattr(previous, name)
+        )
+
+
+_STATUS_FIELDS = frozenset(
+    field.name for field in fields(LetPotDeviceStatus) if field.name != "raw"
+)
+"""Names of the device status fields which can change."""
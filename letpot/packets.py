@@ -0,0 +1,219 @@
+"""Packets for Python client for LetPot hydroponic gardens."""
+
+import logging
+import time as systime
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+
+_LOGGER = logging.getLogger(__name__)
+
+PACKET_FLAG_MORE = 16
+"""Packet header flag indicating that more packets follow for the message."""
+
+
+class PayloadCodec(ABC):
+    """Encoding of packets in MQTT message payloads."""
+
+    @abstractmethod
+    def encode(self, packet: bytes | bytearray) -> str | bytes:
+        """Encodes a packet to a message payload."""
+
+    @abstractmethod
+    def decode(self, payload: bytes) -> bytes:
+        """Decodes a message payload to a packet, raises ValueError if invalid."""
+
+
+class HexPayloadCodec(PayloadCodec):
+    """Packets as hexadecimal text, supported by all devices."""
+
+    def encode(self, packet: bytes | bytearray) -> str:
+        return packet.hex()
+
+    def decode(self, payload: bytes) -> bytes:
+        return bytes.fromhex(payload.decode("ascii"))
+
+
+class BinaryPayloadCodec(PayloadCodec):
+    """Packets as raw bytes, half the size of hexadecimal text.
+
+    Only use this for device types of which the firmware accepts binary payloads.
+    """
+
+    def encode(self, packet: bytes | bytearray) -> bytes:
+        return bytes(packet)
+
+    def decode(self, payload: bytes) -> bytes:
+        return payload
+
+
+HEX_CODEC = HexPayloadCodec()
+"""Default payload codec for devices."""
+
+
+def encode_packets(
+    packet_type: int, message: bytes | Sequence[int], message_id: int, mtu: int
+) -> list[bytearray]:
+    """Split a message into packets with a header, numbered from the message id."""
+    length = len(message)
+    max_payload = mtu - 6
+    packets: list[bytearray] = []
+    for start in range(0, length, max_payload):
+        payload = message[start : start + max_payload]
+        packet_id = (message_id + len(packets)) & 0xFF
+        if start + max_payload < length:
+            packet = bytearray(
+                (
+                    packet_type,
+                    PACKET_FLAG_MORE,
+                    packet_id,
+                    len(payload) + 4,
+                    length & 0xFF,
+                    length >> 8,
+                )
+            )
+        else:
+            packet = bytearray((packet_type, 0, packet_id, len(payload)))
+        packet += bytes(payload)
+        packets.append(packet)
+    return packets
+
+
+class LetPotPacketCache:
+    """Packets for constant messages, encoded once and patched with the message id.
+
+    Only use this for messages which don't change, like a status request, as every
+    message is kept in the cache.
+    """
+
+    def __init__(self, mtu: int) -> None:
+        """Initialize cache for packets with the maximum packet size."""
+        self.mtu = mtu
+        self._packets: dict[tuple[int, bytes], tuple[bytes, ...]] = {}
+
+    def get(self, packet_type: int, message: bytes, message_id: int) -> list[bytearray]:
+        """Get the packets for a message, numbered from the message id."""
+        key = (packet_type, message)
+        if (templates := self._packets.get(key)) is None:
+            templates = self._packets[key] = tuple(
+                bytes(packet)
+                for packet in encode_packets(packet_type, message, 0, self.mtu)
+            )
+        packets: list[bytearray] = []
+        for template in templates:
+            packet = bytearray(template)
+            packet[2] = (message_id + len(packets)) & 0xFF
+            packets.append(packet)
+        return packets
+
+
+class _PartialMessage:
+    """Packets received so far for a message split over multiple packets."""
+
+    __slots__ = ("chunks", "length", "message_id", "started", "total")
+
+    def __init__(self, total: int, message_id: int, started: float) -> None:
+        self.chunks: list[bytes] = []
+        self.length = 0
+        self.message_id = message_id
+        self.started = started
+        self.total = total
+
+
+class LetPotPacketReassembler:
+    """Reassembles messages split over multiple packets, per device serial.
+
+    A packet starts with a header of type, flag, message id and payload length.
+    If the flag indicates more packets follow, the header also includes the total
+    message length (little-endian). Message ids increase by one for every packet.
+    """
+
+    def __init__(
+        self, max_pending: int = 64, max_length: int = 4096, timeout: float = 10
+    ) -> None:
+        """Initialize reassembler.
+
+        Args:
+            max_pending: the maximum number of devices with an incomplete message,
+                the oldest incomplete message is dropped when exceeded.
+            max_length: the maximum total length of a message.
+            timeout: seconds after which an incomplete message is dropped.
+        """
+        self.max_pending = max_pending
+        self.max_length = max_length
+        self.timeout = timeout
+        self.dropped_packets = 0
+        self.reassembled_messages = 0
+        self._pending: dict[str, _PartialMessage] = {}
+
+    def add(self, serial: str, packet: bytes) -> bytes | None:
+        """Add a received packet, returns the message if it is complete."""
+        if len(packet) < 4:
+            self.dropped_packets += 1
+            return None
+        more = packet[1] & PACKET_FLAG_MORE
+        if not more and serial not in self._pending:
+            return packet
+
+        now = systime.monotonic()
+        self._drop_expired(now)
+        partial = self._pending.get(serial)
+        if partial is not None and (
+            packet[2] != (partial.message_id + 1) & 0xFF
+            or (
+                more
+                and len(packet) >= 6
+                and packet[4] | packet[5] << 8 != partial.total
+            )
+        ):
+            _LOGGER.debug("Dropping incomplete message for %s, out of sequence", serial)
+            self._drop(serial)
+            partial = None
+
+        if not more:
+            if partial is None:
+                return packet
+            del self._pending[serial]
+            partial.chunks.append(packet[4:])
+            message = b"".join(partial.chunks)
+            if len(message) != partial.total:
+                _LOGGER.debug("Dropping message for %s, length mismatch", serial)
+                self.dropped_packets += len(partial.chunks)
+                return None
+            self.reassembled_messages += 1
+            return bytes((packet[0], 0, packet[2], partial.total & 0xFF)) + message
+
+        if len(packet) < 6:
+            self.dropped_packets += 1
+            return None
+        if partial is None:
+            total = packet[4] | packet[5] << 8
+            if total > self.max_length:
+                _LOGGER.debug("Dropping packet for %s, message too long", serial)
+                self.dropped_packets += 1
+                return None
+            if len(self._pending) >= self.max_pending:
+                self._drop(next(iter(self._pending)))
+            partial = self._pending[serial] = _PartialMessage(total, packet[2], now)
+        else:
+            partial.message_id = packet[2]
+        partial.chunks.append(packet[6:])
+        partial.length += len(packet) - 6
+        if partial.length >= partial.total:
+            _LOGGER.debug("Dropping message for %s, length exceeded", serial)
+            self._drop(serial)
+        return None
+
+    def _drop(self, serial: str) -> None:
+        """Drop the incomplete message for the serial."""
+        partial = self._pending.pop(serial)
+        self.dropped_packets += len(partial.chunks)
+
+    def _drop_expired(self, now: float) -> None:
+        """Drop incomplete messages which haven't completed within the timeout."""
+        for serial in [
+            serial
+            for serial, partial in self._pending.items()
+            if now - partial.started > self.timeout
+        ]:
+            _LOGGER.debug("Dropping incomplete message for %s, timed out", serial)
+            self._drop(serial)
@@ -0,0 +1,157 @@
+"""Status stores for Python client for LetPot hydroponic gardens."""
+
+import sqlite3
+import threading
+import time as systime
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+
+@dataclass(frozen=True, slots=True)
+class StoredStatus:
+    """Status message for a device, with the time it was received."""
+
+    raw: bytes
+    received: float
+    """Unix timestamp when the status was received."""
+
+    @property
+    def age(self) -> float:
+        """Returns the number of seconds since the status was received."""
+        return max(systime.time() - self.received, 0)
+
+
+class LetPotStatusStore(ABC):
+    """Store for the last status message received from devices.
+
+    Stores which block (for example for file I/O) are used from an executor by the
+    device client, and must be safe to use from another thread.
+    """
+
+    blocking: bool = False
+
+    @abstractmethod
+    def get(self, serial: str) -> StoredStatus | None:
+        """Returns the stored status for the device, or None if unknown."""
+
+    @abstractmethod
+    def set(self, serial: str, status: StoredStatus) -> None:
+        """Stores the status for the device."""
+
+    @abstractmethod
+    def delete(self, serial: str) -> None:
+        """Removes the stored status for the device."""
+
+    def get_many(self, serials: Iterable[str]) -> dict[str, StoredStatus]:
+        """Returns the stored statuses for the devices, leaving out unknown devices."""
+        return {
+            serial: status
+            for serial in serials
+            if (status := self.get(serial)) is not None
+        }
+
+    def set_many(self, statuses: Mapping[str, StoredStatus]) -> None:
+        """Stores the statuses for multiple devices."""
+        for serial, status in statuses.items():
+            self.set(serial, status)
+
+    def close(self) -> None:
+        """Closes the store, if it uses any resources."""
+
+
+class MemoryStatusStore(LetPotStatusStore):
+    """Status store in memory, removing the least recently used device if full."""
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """Initialize store for at most maxsize devices."""
+        self.maxsize = maxsize
+        self._statuses: OrderedDict[str, StoredStatus] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Returns the number of stored devices."""
+        return len(self._statuses)
+
+    def get(self, serial: str) -> StoredStatus | None:
+        if (status := self._statuses.get(serial)) is not None:
+            self._statuses.move_to_end(serial)
+        return status
+
+    def set(self, serial: str, status: StoredStatus) -> None:
+        self._statuses[serial] = status
+        self._statuses.move_to_end(serial)
+        if len(self._statuses) > self.maxsize:
+            self._statuses.popitem(last=False)
+
+    def delete(self, serial: str) -> None:
+        self._statuses.pop(serial, None)
+
+
+class SQLiteStatusStore(LetPotStatusStore):
+    """Status store in a SQLite database file, for keeping statuses across restarts."""
+
+    blocking = True
+
+    def __init__(self, path: str | Path) -> None:
+        """Initialize store, creating the database file if required."""
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS status "
+            "(serial TEXT PRIMARY KEY, raw BLOB NOT NULL, received REAL NOT NULL)"
+        )
+
+    def get(self, serial: str) -> StoredStatus | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT raw, received FROM status WHERE serial = ?", (serial,)
+            ).fetchone()
+        return None if row is None else StoredStatus(row[0], row[1])
+
+    def get_many(self, serials: Iterable[str]) -> dict[str, StoredStatus]:
+        serials = list(serials)
+        statuses = {}
+        with self._lock:
+            for n in range(0, len(serials), 500):
+                batch = serials[n : n + 500]
+                rows = self._connection.execute(
+                    "SELECT serial, raw, received FROM status WHERE serial IN "
+                    f"({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                statuses.update({row[0]: StoredStatus(row[1], row[2]) for row in rows})
+        return statuses
+
+    def set(self, serial: str, status: StoredStatus) -> None:
+        self.set_many({serial: status})
+
+    def set_many(self, statuses: Mapping[str, StoredStatus]) -> None:
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO status (serial, raw, received) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (serial, status.raw, status.received)
+                        for serial, status in statuses.items()
+                    ],
+                )
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def delete(self, serial: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM status WHERE serial = ?", (serial,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,23 @@
+"""Tests for the backoff policy."""
+
+from unittest.mock import patch
+
+from letpot.backoff import BackoffPolicy
+
+
+def test_backoff_exponential_with_cap() -> None:
+    """Test that delays increase exponentially up to the cap."""
+    policy = BackoffPolicy(base=5, cap=60, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(1, 7)] == [0, 5, 10, 20, 40, 60]
+    assert policy.delay(10_000) == 60
+
+    policy = BackoffPolicy(base=5, cap=60, jitter=False, immediate_first_retry=False)
+    assert policy.delay(1) == 5
+
+
+def test_backoff_full_jitter() -> None:
+    """Test that jitter uses a random delay up to the exponential delay."""
+    policy = BackoffPolicy(base=5, cap=60)
+    with patch("letpot.backoff.random.uniform", return_value=1.5) as mock_uniform:
+        assert policy.delay(3) == 1.5
+    mock_uniform.assert_called_once_with(0, 10)
@@ -0,0 +1,472 @@
+"""Tests for the account client."""
+
+import asyncio
+import dataclasses
+import time
+from collections.abc import AsyncGenerator
+from unittest.mock import MagicMock
+
+import pytest
+import pytest_asyncio
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from letpot.backoff import BackoffPolicy
+from letpot.client import (
+    LetPotCircuitBreaker,
+    LetPotClient,
+    LetPotClientPool,
+    LetPotRateLimiter,
+    _Response,
+)
+from letpot.exceptions import LetPotAuthenticationException, LetPotConnectionException
+from letpot.models import AuthenticationInfo
+
+from . import AUTHENTICATION
+
+DEVICE = {
+    "sn": "LPH21ABCD",
+    "name": "Garden",
+    "dev_type": "LPH21",
+    "is_online": True,
+    "is_remote": False,
+}
+
+
+class FakeApi:
+    """Fake LetPot API, with an access token which is replaced on every refresh."""
+
+    def __init__(self) -> None:
+        self.token = "access_token"
+        self.refresh_calls = 0
+        self.devices_calls = 0
+        self.device_list = [DEVICE]
+        self.etag = '"1"'
+        self.failures = 0
+        self.devices_body: dict | None = None
+        self.failing_users: set[str] = set()
+        self.refresh_status = 200
+        self.app = web.Application()
+        self.app.router.add_post("/app/auth/login", self.login)
+        self.app.router.add_get("/app/auth/refresh", self.refresh)
+        self.app.router.add_get("/app/devices", self.devices)
+
+    def _token(self, token: str) -> dict:
+        return {"token": token, "exp": int(time.time()) + 3600}
+
+    async def login(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        if form["password"] == "broken":
+            return web.Response(text="<html>Maintenance</html>")
+        if form["password"] != "password":
+            return web.Response(status=403)
+        return web.json_response(
+            {
+                "ok": True,
+                "data": {
+                    "token": self._token(self.token),
+                    "refreshToken": self._token("refresh_token"),
+                    "user_id": AUTHENTICATION.user_id,
+                },
+            }
+        )
+
+    async def refresh(self, request: web.Request) -> web.Response:
+        self.refresh_calls += 1
+        await asyncio.sleep(0.01)
+        if self.refresh_status != 200:
+            return web.Response(status=self.refresh_status)
+        self.token = f"access_token_{self.refresh_calls}"
+        return web.json_response(
+            {
+                "ok": True,
+                "data": {
+                    "token": self._token(self.token),
+                    "refreshToken": self._token("refresh_token"),
+                },
+            }
+        )
+
+    async def devices(self, request: web.Request) -> web.Response:
+        if request.headers["Authorization"] != self.token:
+            return web.Response(status=401, text="Unauthorized")
+        self.devices_calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        await asyncio.sleep(0.01)
+        if self.devices_body is not None:
+            return web.json_response(self.devices_body)
+        if request.headers["uid"] in self.failing_users:
+            return web.json_response({"ok": False, "message": "Server busy"})
+        if request.headers.get("If-None-Match") == self.etag:
+            return web.Response(status=304)
+        return web.json_response(
+            {"ok": True, "data": self.device_list}, headers={"ETag": self.etag}
+        )
+
+
+@pytest_asyncio.fixture()
+async def api() -> AsyncGenerator[tuple[FakeApi, str]]:
+    """Run a fake API, returns the API and its host for the client."""
+    fake_api = FakeApi()
+    async with TestServer(fake_api.app) as server:
+        yield fake_api, str(server.make_url("/app/"))
+
+
+def _auth(expires_in: int) -> AuthenticationInfo:
+    """Authentication info with an access token expiring in expires_in seconds."""
+    return AuthenticationInfo(
+        access_token="access_token",
+        access_token_expires=int(time.time()) + expires_in,
+        refresh_token="refresh_token",
+        refresh_token_expires=int(time.time()) + 86400,
+        user_id=AUTHENTICATION.user_id,
+        email=AUTHENTICATION.email,
+    )
+
+
+async def test_concurrent_requests_refresh_once(api: tuple[FakeApi, str]) -> None:
+    """Test that concurrent requests with an expiring token refresh it once."""
+    fake_api, host = api
+    on_token_refresh = MagicMock()
+    async with ClientSession() as session:
+        client = LetPotClient(
+            session, _auth(expires_in=60), on_token_refresh=on_token_refresh
+        )
+        client.API_HOST = host
+
+        results = await asyncio.gather(*(client.get_devices() for _ in range(10)))
+
+    assert all(len(devices) == 1 for devices in results)
+    assert fake_api.refresh_calls == 1
+    on_token_refresh.assert_called_once()
+    assert on_token_refresh.call_args.args[0].access_token == "access_token_1"
+
+
+async def test_unauthorized_request_is_retried(api: tuple[FakeApi, str]) -> None:
+    """Test that an unauthorized request refreshes the token and is retried once."""
+    fake_api, host = api
+    fake_api.token = "revoked"
+    async with ClientSession() as session:
+        client = LetPotClient(session, _auth(expires_in=3600))
+        client.API_HOST = host
+
+        devices = await client.get_devices()
+
+    assert devices[0].serial_number == "LPH21ABCD"
+    assert fake_api.refresh_calls == 1
+
+
+async def test_scheduled_refresh(api: tuple[FakeApi, str]) -> None:
+    """Test that the token is refreshed in the background before it expires."""
+    fake_api, host = api
+    async with ClientSession() as session:
+        client = LetPotClient(
+            session, _auth(expires_in=3600), on_token_refresh=MagicMock()
+        )
+        client.API_HOST = host
+        await client.get_devices()
+        assert client._refresh_timer is not None
+        assert fake_api.refresh_calls == 0
+
+        # Reschedule as if the token is about to expire
+        client._refresh_margin = client._access_token_expires - time.time()
+        client._schedule_refresh()
+        while fake_api.refresh_calls == 0:
+            await asyncio.sleep(0.01)
+        assert client._refresh_task is not None
+        await client._refresh_task
+        assert client._access_token == "access_token_1"
+        assert client._refresh_timer is not None
+        client._refresh_timer.cancel()
+
+
+async def test_error_responses_release_connections(api: tuple[FakeApi, str]) -> None:
+    """Test that error responses release the connection, and the session is closed."""
+    fake_api, host = api
+    fake_api.token = "revoked"
+    async with LetPotClient(
+        info=_auth(expires_in=3600), auto_refresh=False, connector_limit=1
+    ) as client:
+        client.API_HOST = host
+        for _ in range(3):
+            with pytest.raises(LetPotAuthenticationException):
+                await asyncio.wait_for(client.get_devices(), 1)
+        session = client._session
+        assert session is not None
+
+    assert session.closed
+    assert client._session is None
+
+
+async def test_close_keeps_passed_session(api: tuple[FakeApi, str]) -> None:
+    """Test that closing the client doesn't close a session which was passed in."""
+    _, host = api
+    async with ClientSession() as session:
+        async with LetPotClient(
+            session, _auth(expires_in=3600), on_token_refresh=MagicMock()
+        ) as client:
+            client.API_HOST = host
+            await client.get_devices()
+            assert client._refresh_timer is not None
+
+        assert client._refresh_timer is None
+        assert not session.closed
+
+
+async def test_concurrent_get_devices_share_request(api: tuple[FakeApi, str]) -> None:
+    """Test that concurrent calls to get devices share a single request."""
+    fake_api, host = api
+    async with LetPotClient(info=_auth(expires_in=3600)) as client:
+        client.API_HOST = host
+
+        results = await asyncio.gather(*(client.get_devices() for _ in range(5)))
+
+    assert all(devices == results[0] for devices in results)
+    assert fake_api.devices_calls == 1
+
+
+async def test_device_cache_not_modified(api: tuple[FakeApi, str]) -> None:
+    """Test that cached devices are returned, and reused when not modified."""
+    fake_api, host = api
+    async with LetPotClient(info=_auth(expires_in=3600), device_cache_ttl=60) as client:
+        client.API_HOST = host
+
+        devices = await client.get_devices()
+        assert await client.get_devices() == devices
+        assert fake_api.devices_calls == 1
+
+        assert await client.get_devices(force_refresh=True) == devices
+        assert fake_api.devices_calls == 2
+
+        fake_api.etag = '"2"'
+        fake_api.device_list = [{**DEVICE, "name": "Kitchen"}]
+        devices = await client.get_devices(force_refresh=True)
+        assert devices[0].name == "Kitchen"
+        assert fake_api.devices_calls == 3
+
+
+async def test_device_cache_stale_while_revalidate(api: tuple[FakeApi, str]) -> None:
+    """Test that stale cached devices are returned while refreshing in the background."""
+    fake_api, host = api
+    async with LetPotClient(
+        info=_auth(expires_in=3600), device_cache_ttl=0, device_cache_stale=60
+    ) as client:
+        client.API_HOST = host
+        await client.get_devices()
+        fake_api.etag = '"2"'
+        fake_api.device_list = []
+
+        devices = await client.get_devices()
+        assert len(devices) == 1
+        await client._device_requests[AUTHENTICATION.user_id]
+
+        assert await client.get_devices() == []
+        assert fake_api.devices_calls == 2
+
+
+async def test_get_device_changes(api: tuple[FakeApi, str]) -> None:
+    """Test the changes to the devices between calls."""
+    fake_api, host = api
+    async with LetPotClient(info=_auth(expires_in=3600)) as client:
+        client.API_HOST = host
+
+        changes = await client.get_device_changes()
+        assert [device.serial_number for device in changes.added] == ["LPH21ABCD"]
+        assert not await client.get_device_changes()
+
+        fake_api.etag = '"2"'
+        fake_api.device_list = [
+            {**DEVICE, "name": "Kitchen", "is_online": False},
+            {**DEVICE, "sn": "LPH62ABCD"},
+        ]
+        changes = await client.get_device_changes()
+
+    assert [device.serial_number for device in changes.added] == ["LPH62ABCD"]
+    assert changes.removed == []
+    assert [device.name for device in changes.renamed] == ["Kitchen"]
+    assert [device.is_online for device in changes.online_changed] == [False]
+
+
+async def test_rate_limiter() -> None:
+    """Test that the rate limiter allows a burst, and then limits the rate."""
+    limiter = LetPotRateLimiter(rate=50, burst=2)
+    start = time.monotonic()
+    for _ in range(2):
+        await limiter.acquire("api.letpot.net")
+    assert time.monotonic() - start < 0.02
+    for _ in range(3):
+        await limiter.acquire("api.letpot.net")
+    assert time.monotonic() - start >= 0.05
+    await limiter.acquire("other.host")
+    assert time.monotonic() - start < 0.1
+
+
+async def test_pool_sync(api: tuple[FakeApi, str]) -> None:
+    """Test synchronizing accounts with info and credentials, including errors."""
+    _, host = api
+    accounts: list[AuthenticationInfo | tuple[str, str]] = [
+        _auth(expires_in=3600),
+        ("first@example.com", "password"),
+        ("second@example.com", "wrong"),
+    ]
+    async with LetPotClientPool(concurrency=2) as pool:
+        for email in ("first@example.com", "second@example.com", AUTHENTICATION.email):
+            pool.client(email).API_HOST = host
+
+        results = {result.email: result async for result in pool.iter_sync(accounts)}
+
+        assert len(pool) == 3
+        sessions = {client._session for client in pool._clients.values()}
+        assert sessions == {pool._session}
+
+    assert results[AUTHENTICATION.email].devices is not None
+    assert results["first@example.com"].info is not None
+    assert results["first@example.com"].devices is not None
+    assert isinstance(
+        results["second@example.com"].error, LetPotAuthenticationException
+    )
+    assert len(pool) == 0
+
+
+FAST_RETRY = BackoffPolicy(base=0.01, jitter=False, immediate_first_retry=False)
+
+
+async def test_transient_errors_are_retried(api: tuple[FakeApi, str]) -> None:
+    """Test that requests failing with a transient error are retried."""
+    fake_api, host = api
+    fake_api.failures = 2
+    async with LetPotClient(
+        info=_auth(expires_in=3600), retry_backoff=FAST_RETRY
+    ) as client:
+        client.API_HOST = host
+
+        devices = await client.get_devices()
+
+    assert len(devices) == 1
+    assert fake_api.devices_calls == 3
+    assert client.request_stats.retries == 2
+    assert client.request_stats.failures == 0
+
+
+async def test_circuit_breaker_fails_fast(api: tuple[FakeApi, str]) -> None:
+    """Test that requests are not sent while the circuit breaker is open."""
+    fake_api, host = api
+    fake_api.failures = 100
+    breaker = LetPotCircuitBreaker(failure_threshold=2, reset_timeout=60)
+    async with LetPotClient(
+        info=_auth(expires_in=3600), retries=0, circuit_breaker=breaker
+    ) as client:
+        client.API_HOST = host
+        for _ in range(3):
+            with pytest.raises(LetPotConnectionException):
+                await client.get_devices()
+
+    assert fake_api.devices_calls == 2
+    assert breaker.is_open(host.split("/")[2])
+    assert client.request_stats.short_circuits == 1
+    assert client.request_stats.failures == 2
+
+
+def test_circuit_breaker_half_open() -> None:
+    """Test that an open circuit allows a single request after the reset timeout."""
+    breaker = LetPotCircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure("api.letpot.net")
+    assert breaker.is_open("api.letpot.net")
+    assert breaker.allow("api.letpot.net")
+    breaker.record_success("api.letpot.net")
+    assert not breaker.is_open("api.letpot.net")
+
+
+def test_retry_after() -> None:
+    """Test parsing the Retry-After header as seconds or a date."""
+    assert _Response(429, {"Retry-After": "2"}, b"").retry_after() == 2
+    assert _Response(429, {"Retry-After": "soon"}, b"").retry_after() is None
+    date = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert _Response(503, {"Retry-After": date}, b"").retry_after() == 0
+    assert _Response(503, {}, b"").retry_after() is None
+
+
+async def test_login_invalid_response(api: tuple[FakeApi, str]) -> None:
+    """Test that a login response which isn't JSON raises a connection exception."""
+    _, host = api
+    async with LetPotClient() as client:
+        client.API_HOST = host
+        with pytest.raises(LetPotConnectionException):
+            await client.login("email@example.com", "broken")
+
+
+async def test_get_devices_invalid_response(api: tuple[FakeApi, str]) -> None:
+    """Test that an unexpected devices response raises a connection exception."""
+    fake_api, host = api
+    async with LetPotClient(info=_auth(expires_in=3600)) as client:
+        client.API_HOST = host
+        for body in (
+            {"ok": False, "message": "Server busy"},
+            {"ok": True, "data": [{"sn": "LPH21ABCD"}]},
+            {"ok": True, "data": None},
+        ):
+            fake_api.devices_body = body
+            with pytest.raises(LetPotConnectionException):
+                await client.get_devices()
+
+
+async def test_pool_sync_failing_account(api: tuple[FakeApi, str]) -> None:
+    """Test that an account with an unexpected response doesn't stop other accounts."""
+    fake_api, host = api
+    fake_api.failing_users.add("failing_user")
+    failing = dataclasses.replace(
+        _auth(expires_in=3600), user_id="failing_user", email="failing@example.com"
+    )
+    async with LetPotClientPool() as pool:
+        for email in ("failing@example.com", AUTHENTICATION.email):
+            pool.client(email).API_HOST = host
+
+        results = {
+            result.email: result
+            async for result in pool.iter_sync([failing, _auth(expires_in=3600)])
+        }
+
+    assert isinstance(results["failing@example.com"].error, LetPotConnectionException)
+    assert results[AUTHENTICATION.email].devices is not None
+
+
+async def test_failed_refresh_uses_valid_token(api: tuple[FakeApi, str]) -> None:
+    """Test that a failed refresh before the token expires doesn't fail the request."""
+    fake_api, host = api
+    fake_api.refresh_status = 503
+    async with LetPotClient(
+        info=_auth(expires_in=200), retries=0, on_token_refresh=MagicMock()
+    ) as client:
+        client.API_HOST = host
+
+        devices = await client.get_devices()
+
+    assert len(devices) == 1
+    assert fake_api.refresh_calls >= 1
+
+
+async def test_failed_refresh_expired_token(api: tuple[FakeApi, str]) -> None:
+    """Test that a failed refresh after the token expired fails the request."""
+    fake_api, host = api
+    fake_api.refresh_status = 503
+    async with LetPotClient(info=_auth(expires_in=-10), retries=0) as client:
+        client.API_HOST = host
+
+        with pytest.raises(LetPotConnectionException):
+            await client.get_devices()
+
+
+async def test_no_background_refresh_without_callback(
+    api: tuple[FakeApi, str],
+) -> None:
+    """Test that tokens are only refreshed in advance with a callback to store them."""
+    fake_api, host = api
+    async with LetPotClient(info=_auth(expires_in=60)) as client:
+        client.API_HOST = host
+
+        await client.get_devices()
+
+        assert client._refresh_timer is None
+    assert fake_api.refresh_calls == 0
@@ -1,8 +1,18 @@
 """Tests for the converters."""
 
+from datetime import time
+
 import pytest
 
-from letpot.converters import CONVERTERS, LetPotDeviceConverter, LPHx1Converter
+from letpot import converters
+from letpot.converters import (
+    CONVERTERS,
+    LetPotDeviceConverter,
+    LPHx1Converter,
+    MessageLayout,
+    get_converter,
+    register_converter,
+)
 from letpot.exceptions import LetPotException
 
 from . import DEVICE_STATUS
@@ -53,6 +63,40 @@ def test_unsupported_finds_no_converter() -> None:
     assert converter is None
 
 
+@pytest.mark.parametrize(
+    "device_type",
+    SUPPORTED_DEVICE_TYPES,
+)
+def test_get_converter_is_shared(device_type: str) -> None:
+    """Test that the converter for a device type is created once and shared."""
+    converter = get_converter(device_type)
+    assert converter.supports_type(device_type)
+    assert get_converter(device_type) is converter
+
+
+def test_get_converter_unsupported_raises_exception() -> None:
+    """Test that getting a converter for an unknown device type isn't possible."""
+    with pytest.raises(LetPotException, match="No converter available"):
+        get_converter("TEST1")
+
+
+def test_register_converter(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a registered converter takes precedence over existing converters."""
+    monkeypatch.setattr(converters, "CONVERTERS", list(CONVERTERS))
+    monkeypatch.setattr(converters, "_CONVERTER_INSTANCES", {})
+
+    class TestConverter(LPHx1Converter):
+        @staticmethod
+        def supports_type(device_type: str) -> bool:
+            return device_type in ["LPH21", "TEST1"]
+
+    assert isinstance(get_converter("LPH21"), LPHx1Converter)
+    register_converter(TestConverter)
+    assert isinstance(get_converter("LPH21"), TestConverter)
+    assert isinstance(get_converter("TEST1"), TestConverter)
+    assert not isinstance(get_converter("LPH11"), TestConverter)
+
+
 @pytest.mark.parametrize(
     "converter",
     CONVERTERS,
@@ -88,3 +132,79 @@ def test_lph21_message_to_status() -> None:
     message = b"4d000112620100010101010000071e110001f4000000"
     status = converter.convert_hex_to_status(message)
     assert status == DEVICE_STATUS
+
+
+@pytest.mark.parametrize(
+    "message",
+    [b"4d00zz", b"4d0", "4d00".encode("utf-16")],
+)
+def test_invalid_hex_raises_exception(message: bytes) -> None:
+    """Test that a message which isn't valid hexadecimal raises an exception."""
+    converter = LPHx1Converter("LPH21")
+    with pytest.raises(LetPotException, match="Unable to convert from hex"):
+        converter.convert_hex_to_status(message)
+
+
+def test_lph21_status_to_update_message() -> None:
+    """Test that a status for a LPH21 device type encodes to a certain update message."""
+    converter = LPHx1Converter("LPH21")
+    message = converter.get_update_status_message(DEVICE_STATUS)
+    assert message == [97, 2, 1, 1, 1, 0, 0, 7, 30, 17, 0, 1, 244, 0]
+
+
+@pytest.mark.parametrize(
+    "device_type",
+    SUPPORTED_DEVICE_TYPES,
+)
+def test_status_update_message_symmetry(device_type: str) -> None:
+    """Test that a decoded status encodes back to an update with the same settings."""
+    converter = get_converter(device_type)
+    frame = bytearray(32)
+    frame[4:6] = (converter.get_current_status_message()[0] + 1, 1)
+    frame[8:17] = (1, 1, 1, 1, 2, 7, 30, 17, 45)  # on, pump, mode, days, schedule
+
+    status = converter.convert_bytes_to_status(bytes(frame))
+    assert status is not None
+    assert status.plant_days == 258
+    assert status.light_schedule_end == time(17, 45)
+
+    message = converter.get_update_status_message(status)
+    assert message[2:11] == list(frame[8:17])
+
+
+@pytest.mark.parametrize(
+    "device_type",
+    ["LPH21", "IGS01", "LPH60", "LPH63"],
+)
+def test_short_status_is_ignored(device_type: str) -> None:
+    """Test that a status message shorter than the status layout returns None."""
+    converter = get_converter(device_type)
+    frame = bytearray(12)
+    frame[4:6] = (converter.get_current_status_message()[0] + 1, 1)
+    assert converter.convert_bytes_to_status(bytes(frame)) is None
+
+
+def test_message_layout() -> None:
+    """Test that a message layout (un)packs values including padding and times."""
+    layout = MessageLayout([("a", "B"), ("", "x"), ("b", "H"), ("c", "T")])
+    assert layout.names == ("a", "b", "c")
+    assert layout.size == 6
+    data = layout.pack([1, 515, 7 * 256 + 30])
+    assert data == bytes([1, 0, 2, 3, 7, 30])
+    assert layout.unpack(b"\xff" + data, 1) == {"a": 1, "b": 515, "c": 1822}
+
+    with pytest.raises(LetPotException, match="Unable to pack"):
+        layout.pack([256, 0, 0])
+
+
+def test_status_errors_are_shared() -> None:
+    """Test that statuses with the same errors share one immutable errors instance."""
+    converter = LPHx1Converter("LPH21")
+    message = b"4d000112620100010101010000071e110001f4000000"
+    status1 = converter.convert_hex_to_status(message)
+    status2 = converter.convert_hex_to_status(message)
+    assert status1 is not None and status2 is not None
+    assert status1 is not status2
+    assert status1.errors is status2.errors
+    with pytest.raises(AttributeError):
+        status1.errors.low_water = False  # type: ignore[misc]
@@ -1,17 +1,26 @@
 """Tests for the device client."""
 
 import asyncio
+import dataclasses
 from collections.abc import AsyncGenerator
+from pathlib import Path
 from contextlib import nullcontext
+from datetime import time
 from unittest.mock import MagicMock, patch
 
 import pytest
 import pytest_asyncio
-from aiomqtt import Client, Message
+from aiomqtt import Client, Message, MqttError
 
-from letpot.deviceclient import LetPotDeviceClient
-from letpot.exceptions import LetPotFeatureException
+from letpot.deviceclient import (
+    DeviceStateStats,
+    LetPotDeviceClient,
+    LetPotDeviceClientPool,
+)
+from letpot.exceptions import LetPotException, LetPotFeatureException
 from letpot.models import TemperatureUnit
+from letpot.packets import BinaryPayloadCodec
+from letpot.store import MemoryStatusStore, SQLiteStatusStore, StoredStatus
 
 from . import AUTHENTICATION, DEVICE_STATUS
 
@@ -31,6 +40,8 @@ class MockMessagesIterator:
         item = await self.queue.get()
         if item is StopAsyncIteration:
             raise StopAsyncIteration
+        if isinstance(item, Exception):
+            raise item
         return item
 
 
@@ -96,6 +107,58 @@ async def test_subscribe_multiple(
     assert device_client._client_task.cancelled()
 
 
+async def test_subscribe_many(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test subscribing to multiple devices at once batches topics in packets."""
+    devices = [f"LPH21{n:04}" for n in range(5)]
+    device_client.SUBSCRIBE_BATCH_SIZE = 2
+
+    await device_client.subscribe_many(devices, lambda _: None)
+    assert device_client._client is not None
+    subscribe = device_client._client.subscribe
+    assert subscribe.call_count == 3  # type: ignore[attr-defined]
+    assert subscribe.call_args_list[0].args[0] == [  # type: ignore[attr-defined]
+        ("LPH210000/data", 0),
+        ("LPH210001/data", 0),
+    ]
+    assert len(device_client._subscriptions) == 5
+
+    await device_client.unsubscribe_many(devices[:3])
+    unsubscribe = device_client._client.unsubscribe
+    assert unsubscribe.call_count == 2  # type: ignore[attr-defined]
+    assert unsubscribe.call_args_list[1].args[0] == ["LPH210002/data"]  # type: ignore[attr-defined]
+    assert device_client._client is not None
+
+    await device_client.unsubscribe_many(devices)
+    assert device_client._client is None
+    assert device_client._client_task.cancelled()
+
+
+async def test_subscribe_same_device(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test subscribing to the same device again adds a callback, not a topic."""
+    device = "LPH21ABCD"
+    callback1 = MagicMock()
+    callback2 = MagicMock()
+
+    await device_client.subscribe(device, callback1)
+    await device_client.subscribe(device, callback2)
+    assert device_client._client is not None
+    assert device_client._client.subscribe.call_count == 1  # type: ignore[attr-defined]
+    assert device_client._subscriptions[device].callbacks == [callback1, callback2]
+
+    await device_client.unsubscribe(device, callback1)
+    assert device_client._client is not None
+    assert device_client._client.unsubscribe.call_count == 0  # type: ignore[attr-defined]
+    assert device_client._subscriptions[device].callbacks == [callback2]
+
+    await device_client.unsubscribe(device)
+    assert device_client._client is None
+    assert device not in device_client._subscriptions
+
+
 async def test_subscribe_callback(
     device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
 ) -> None:
@@ -119,6 +182,7 @@ async def test_subscribe_callback(
             properties=None,
         )
     )
+    await device_client._dispatcher.join()
     # Only device1 should be called
     assert callback1.call_count == 1
     assert not callback2.called
@@ -133,6 +197,7 @@ async def test_subscribe_callback(
             properties=None,
         )
     )
+    await device_client._dispatcher.join()
     # Only device2 should be called, device1 should be same as before
     assert callback1.call_count == 1
     assert callback2.call_count == 1
@@ -161,7 +226,7 @@ async def test_requires_feature_one(
     """Test the requires_feature annotation requiring one feature."""
     # Prepare device client and mock status for use in call
     await device_client.subscribe(serial, lambda _: None)
-    device_client._device_status_last[serial] = DEVICE_STATUS
+    device_client._device(serial).status = DEVICE_STATUS
 
     with expected_result:
         await device_client.set_temperature_unit(serial, TemperatureUnit.CELSIUS)
@@ -189,9 +254,658 @@ async def test_requires_feature_or(
     """Test the requires_feature annotation requiring any of n features."""
     # Prepare device client and mock status for use in call
     await device_client.subscribe(serial, lambda _: None)
-    device_client._device_status_last[serial] = DEVICE_STATUS
+    device_client._device(serial).status = DEVICE_STATUS
 
     with expected_result:
         await device_client.set_light_brightness(serial, 500)
 
     await device_client.unsubscribe(serial)
+
+
+async def test_subscribe_callback_multiple_packets(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test subscription receiving a status split over multiple packets."""
+    device = "LPH21ABCD"
+    callback = MagicMock()
+    await device_client.subscribe(device, callback)
+
+    status = [*DEVICE_STATUS.raw[4:], *bytes(200)]
+    packets = device_client._generate_message_packets(1, 19, status)
+    assert len(packets) == 2
+    for packet in packets:
+        device_client._handle_message(
+            Message(
+                topic=f"{device}/data",
+                payload=packet.hex().encode(),
+                qos=0,
+                retain=False,
+                mid=1,
+                properties=None,
+            )
+        )
+    await device_client._dispatcher.join()
+
+    assert callback.call_count == 1
+    assert callback.call_args.args[0].light_schedule_start == time(7, 30)
+    assert len(callback.call_args.args[0].raw) == len(status) + 4
+
+    await device_client.unsubscribe(device)
+
+
+async def test_clients_do_not_share_state(mock_aiomqtt: MagicMock) -> None:
+    """Test that device clients for different accounts have separate state."""
+    device_client1 = LetPotDeviceClient(AUTHENTICATION)
+    device_client2 = LetPotDeviceClient(
+        dataclasses.replace(AUTHENTICATION, user_id="f6e5d4c3b2a1f6e5d4c3b2a1")
+    )
+
+    await device_client1.subscribe("LPH21ABCD", lambda _: None)
+    device_client1._device("LPH21ABCD").status = DEVICE_STATUS
+    assert device_client2._subscriptions == {}
+    assert len(device_client2._devices) == 0
+
+    await device_client1.unsubscribe("LPH21ABCD")
+
+
+async def test_client_pool(mock_aiomqtt: MagicMock) -> None:
+    """Test that a client pool uses one device client per account."""
+    other_account = dataclasses.replace(
+        AUTHENTICATION, user_id="f6e5d4c3b2a1f6e5d4c3b2a1"
+    )
+    pool = LetPotDeviceClientPool(max_devices=10)
+
+    client1 = await pool.subscribe(AUTHENTICATION, "LPH21ABCD", lambda _: None)
+    client2 = await pool.subscribe(AUTHENTICATION, "LPH21DEFG", lambda _: None)
+    client3 = await pool.subscribe(other_account, "LPH21GHIJ", lambda _: None)
+    assert client1 is client2
+    assert client1 is not client3
+    assert client1._max_devices == client3._max_devices == 10
+    assert len(pool) == 2
+
+    await pool.disconnect()
+    assert len(pool) == 0
+    assert client1._client_task is not None and client1._client_task.cancelled()
+    assert client3._client_task is not None and client3._client_task.cancelled()
+    assert len(client1._subscriptions) == 0
+
+
+async def test_concurrent_subscribe(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test that concurrent subscriptions to a new device keep all callbacks."""
+    device = "LPH21ABCD"
+    callback1 = MagicMock()
+    callback2 = MagicMock()
+
+    await asyncio.gather(
+        device_client.subscribe(device, callback1),
+        device_client.subscribe(device, callback2),
+    )
+    assert device_client._subscriptions[device].callbacks == [callback1, callback2]
+
+    await device_client.unsubscribe(device, callback1)
+    assert device_client._subscriptions[device].callbacks == [callback2]
+    await device_client.unsubscribe(device, callback2)
+    assert device not in device_client._subscriptions
+
+
+async def test_get_current_statuses(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test requesting the status for multiple devices, with offline/failing devices."""
+    devices = ["LPH21ABCD", "LPH21DEFG", "LPH21GHIJ", "LPH21KLMN"]
+    offline_device = "LPH21GHIJ"
+    failing_device = "LPH21KLMN"
+    await device_client.subscribe_many(devices, lambda _: None)
+
+    async def publish(topic: str, payload: str) -> None:
+        serial = topic.split("/")[0]
+        if serial == failing_device:
+            raise MqttError("Publish failed")
+        if serial != offline_device:
+            asyncio.get_running_loop().call_soon(
+                device_client._handle_message,
+                Message(
+                    topic=f"{serial}/data",
+                    payload=b"4d000112620100010101010000071e110001f4000000",
+                    qos=0,
+                    retain=False,
+                    mid=1,
+                    properties=None,
+                ),
+            )
+
+    assert device_client._client is not None
+    device_client._client.publish.side_effect = publish  # type: ignore[attr-defined]
+
+    statuses = await device_client.get_current_statuses(
+        devices, timeout=0.1, concurrency=2
+    )
+    assert statuses == {
+        "LPH21ABCD": DEVICE_STATUS,
+        "LPH21DEFG": DEVICE_STATUS,
+        "LPH21GHIJ": None,
+        "LPH21KLMN": None,
+    }
+    assert device_client._client.publish.call_count == 4  # type: ignore[attr-defined]
+
+    await device_client.unsubscribe_many(devices)
+
+
+async def test_status_store_error(mock_aiomqtt: MagicMock) -> None:
+    """Test that a failing status store doesn't block waiting for the status."""
+    device = "LPH21ABCD"
+    store = MagicMock(spec=MemoryStatusStore)
+    store.blocking = False
+    store.get.return_value = None
+    store.get_many.return_value = {}
+    store.set.side_effect = OSError("Disk full")
+    device_client = LetPotDeviceClient(AUTHENTICATION, status_store=store)
+    await device_client.subscribe(device, lambda _: None)
+
+    async def publish(topic: str, payload: str) -> None:
+        asyncio.get_running_loop().call_soon(
+            device_client._handle_message,
+            Message(
+                topic=f"{device}/data",
+                payload=b"4d000112620100010101010000071e110001f4000000",
+                qos=0,
+                retain=False,
+                mid=1,
+                properties=None,
+            ),
+        )
+
+    assert device_client._client is not None
+    device_client._client.publish.side_effect = publish  # type: ignore[attr-defined]
+    assert await device_client.get_current_status(device, timeout=1) == DEVICE_STATUS
+
+    # Identical statuses aren't written again
+    store.set.side_effect = None
+    store.set.reset_mock()
+    await device_client.get_current_status(device, timeout=1)
+    await device_client.get_current_status(device, timeout=1)
+    store.set.assert_called_once()
+
+    await device_client.unsubscribe(device)
+
+
+async def test_blocking_status_store(mock_aiomqtt: MagicMock, tmp_path: Path) -> None:
+    """Test that a blocking status store is written and read from an executor."""
+    device = "LPH21ABCD"
+    store = SQLiteStatusStore(tmp_path / "status.db")
+    device_client = LetPotDeviceClient(AUTHENTICATION, status_store=store)
+    await device_client.subscribe(device, lambda _: None)
+    device_client._handle_message(
+        Message(
+            topic=f"{device}/data",
+            payload=b"4d000112620100010101010000071e110001f4000000",
+            qos=0,
+            retain=False,
+            mid=1,
+            properties=None,
+        )
+    )
+    assert device_client._store_task is not None
+    assert device in device_client._stored_pending
+    await device_client.disconnect()
+    assert device_client._store_task is None
+    assert store.get(device) is not None
+
+    # Restarted client, loading the status when subscribing
+    device_client = LetPotDeviceClient(AUTHENTICATION, status_store=store)
+    with patch.object(store, "get", side_effect=AssertionError):
+        await device_client.subscribe(device, lambda _: None)
+        assert device_client.get_last_status(device) == DEVICE_STATUS
+    await device_client.disconnect()
+    store.close()
+
+
+async def test_write_coalescing(mock_aiomqtt: MagicMock) -> None:
+    """Test that setter calls within the coalescing window are published once."""
+    device_client = LetPotDeviceClient(AUTHENTICATION, write_coalesce_window=0.05)
+    device = "LPH21ABCD"
+    await device_client.subscribe(device, lambda _: None)
+    device_client._device(device).status = DEVICE_STATUS
+
+    assert device_client._client is not None
+    publish: MagicMock = device_client._client.publish  # type: ignore[assignment]
+    await device_client.set_power(device, False)
+    await device_client.set_plant_days(device, 42)
+    await device_client.set_light_schedule(device, time(8, 0), None)
+    assert publish.call_count == 0
+    assert await device_client.wait_for_write(device, timeout=0.01) is None
+    assert publish.call_count == 1
+    update = device_client._converter(device).get_update_status_message(
+        dataclasses.replace(
+            DEVICE_STATUS,
+            system_on=False,
+            plant_days=42,
+            light_schedule_start=time(8, 0),
+        )
+    )
+    assert publish.call_args.kwargs["payload"][8:] == bytes(update).hex()
+
+    ack = asyncio.create_task(device_client.wait_for_write(device))
+    for payload in [
+        b"4d000112620100010101010000071e110001f4000000",
+        b"4d00011262010001000101002a0800110001f4000000",
+    ]:
+        await asyncio.sleep(0)
+        assert not ack.done()
+        device_client._handle_message(
+            Message(
+                topic=f"{device}/data",
+                payload=payload,
+                qos=0,
+                retain=False,
+                mid=1,
+                properties=None,
+            )
+        )
+    status = await ack
+    assert status is not None
+    assert status.system_on is False
+    assert status.plant_days == 42
+    assert await device_client.wait_for_write(device) is None
+
+    await device_client.unsubscribe(device)
+
+
+async def test_update(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test updating multiple fields in one update, acknowledged by the device."""
+    device = "LPH21ABCD"
+    await device_client.subscribe(device, lambda _: None)
+    device_client._device(device).status = DEVICE_STATUS
+
+    async def publish(topic: str, payload: str) -> None:
+        asyncio.get_running_loop().call_soon(
+            device_client._handle_message,
+            Message(
+                topic=f"{device}/data",
+                payload=b"4d00011262010001000101002a0800110001f4000000",
+                qos=0,
+                retain=False,
+                mid=1,
+                properties=None,
+            ),
+        )
+
+    assert device_client._client is not None
+    publish_mock: MagicMock = device_client._client.publish  # type: ignore[assignment]
+    publish_mock.side_effect = publish
+
+    with pytest.raises(LetPotFeatureException, match="temperature_unit"):
+        await device_client.update(device, temperature_unit=TemperatureUnit.CELSIUS)
+    with pytest.raises(LetPotFeatureException, match="light brightness"):
+        await device_client.update(device, system_on=False, light_brightness=1)
+    assert publish_mock.call_count == 0
+
+    status = await device_client.update(
+        device, timeout=1, system_on=False, plant_days=42, light_schedule_start=time(8)
+    )
+    assert status is not None
+    assert status.light_schedule_start == time(8)
+    assert publish_mock.call_count == 1
+    assert device_client._devices[device].write is None
+
+    await device_client.unsubscribe(device)
+
+
+async def test_binary_payload_codec(mock_aiomqtt: MagicMock) -> None:
+    """Test that a device type with the binary codec sends and receives bytes."""
+    device_client = LetPotDeviceClient(
+        AUTHENTICATION, payload_codecs={"LPH21": BinaryPayloadCodec()}
+    )
+    binary_device = "LPH21ABCD"
+    hex_device = "LPH62ABCD"
+    callback = MagicMock()
+    await device_client.subscribe_many([binary_device, hex_device], callback)
+
+    assert device_client._client is not None
+    publish: MagicMock = device_client._client.publish  # type: ignore[assignment]
+    await device_client.request_status_update(binary_device)
+    await device_client.request_status_update(hex_device)
+    assert publish.call_args_list[0].kwargs["payload"] == bytes([77, 0, 0, 2, 97, 1])
+    assert publish.call_args_list[1].kwargs["payload"] == "4d0001020d01"
+
+    device_client._handle_message(
+        Message(
+            topic=f"{binary_device}/data",
+            payload=bytes.fromhex("4d000112620100010101010000071e110001f4000000"),
+            qos=0,
+            retain=False,
+            mid=1,
+            properties=None,
+        )
+    )
+    await device_client._dispatcher.join()
+    callback.assert_called_once_with(DEVICE_STATUS)
+
+    await device_client.unsubscribe_many([binary_device, hex_device])
+
+
+async def test_identical_status_is_skipped(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test that a repeated identical status isn't decoded or passed to listeners."""
+    device = "LPH21ABCD"
+    callback = MagicMock()
+    await device_client.subscribe(device, callback)
+
+    for message_id, payload in enumerate(
+        [
+            "4d000112620100010101010000071e110001f4000000",
+            "4d000112620100010101010000071e110001f4000000",
+            "4d000212620100010101010000071e110001f4000000",
+            "4d000312620100010100010000071e110001f4000000",
+        ]
+    ):
+        device_client._handle_message(
+            Message(
+                topic=f"{device}/data",
+                payload=payload.encode(),
+                qos=0,
+                retain=False,
+                mid=message_id,
+                properties=None,
+            )
+        )
+    await device_client._dispatcher.join()
+
+    assert callback.call_count == 2
+    assert callback.call_args.args[0].pump_mode == 0
+    assert device_client.stats.duplicate_statuses == 2
+
+    await device_client.unsubscribe(device)
+
+
+async def test_new_callback_receives_identical_status(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test that a callback added to a subscription receives an identical status."""
+    device = "LPH21ABCD"
+    message = Message(
+        topic=f"{device}/data",
+        payload=b"4d000112620100010101010000071e110001f4000000",
+        qos=0,
+        retain=False,
+        mid=1,
+        properties=None,
+    )
+    first_callback = MagicMock()
+    await device_client.subscribe(device, first_callback)
+    device_client._handle_message(message)
+    await device_client._dispatcher.join()
+
+    # Added callback
+    second_callback = MagicMock()
+    await device_client.subscribe(device, second_callback)
+    device_client._handle_message(message)
+    await device_client._dispatcher.join()
+    second_callback.assert_called_once_with(DEVICE_STATUS)
+
+    # Subscribing again after unsubscribing
+    await device_client.unsubscribe(device)
+    await device_client.unsubscribe(device)
+    third_callback = MagicMock()
+    await device_client.subscribe(device, third_callback)
+    device_client._handle_message(message)
+    await device_client._dispatcher.join()
+    third_callback.assert_called_once_with(DEVICE_STATUS)
+
+    await device_client.unsubscribe(device)
+
+
+async def test_status_store_warm_start(mock_aiomqtt: MagicMock) -> None:
+    """Test that a status from the store is used before a status is received."""
+    device = "LPH21ABCD"
+    store = MemoryStatusStore()
+    device_client = LetPotDeviceClient(AUTHENTICATION, status_store=store)
+    await device_client.subscribe(device, lambda _: None)
+    device_client._handle_message(
+        Message(
+            topic=f"{device}/data",
+            payload=b"4d000112620100010101010000071e110001f4000000",
+            qos=0,
+            retain=False,
+            mid=1,
+            properties=None,
+        )
+    )
+    stored = store.get(device)
+    assert stored is not None
+    assert stored.raw == bytes(DEVICE_STATUS.raw)
+    await device_client.unsubscribe(device)
+
+    # Restarted client, with a status received an hour ago
+    store.set(device, StoredStatus(stored.raw, stored.received - 3600))
+    callback = MagicMock()
+    device_client = LetPotDeviceClient(
+        AUTHENTICATION, status_store=store, stored_status_max_age=60
+    )
+    await device_client.subscribe(device, callback)
+    assert device_client.get_last_status(device) == DEVICE_STATUS
+    assert device_client.get_last_status(device, max_age=60) is None
+    assert (device_client.get_last_status_age(device) or 0) >= 3600
+    with pytest.raises(LetPotException, match="doesn't have a status"):
+        await device_client.set_power(device, False)
+
+    device_client._stored_status_max_age = None
+    await device_client.set_power(device, False)
+
+    # The first received status is passed to listeners, even if it is the same
+    device_client._handle_message(
+        Message(
+            topic=f"{device}/data",
+            payload=b"4d000112620100010101010000071e110001f4000000",
+            qos=0,
+            retain=False,
+            mid=1,
+            properties=None,
+        )
+    )
+    await device_client._dispatcher.join()
+    callback.assert_called_once_with(DEVICE_STATUS)
+    assert (device_client.get_last_status_age(device) or 0) < 60
+
+    await device_client.unsubscribe(device)
+
+
+async def test_device_state_eviction(mock_aiomqtt: MagicMock) -> None:
+    """Test that device state is evicted by size and age, except for devices in use."""
+    device_client = LetPotDeviceClient(AUTHENTICATION, max_devices=2, device_ttl=60)
+    await device_client.subscribe("LPH21ABCD", lambda _: None)
+
+    with patch("letpot.deviceclient.systime.monotonic", return_value=100):
+        for device in ["LPH21ABCD", "LPH21DEFG", "LPH21GHIJ"]:
+            device_client._device(device).status = DEVICE_STATUS
+    assert list(device_client._devices) == ["LPH21ABCD", "LPH21GHIJ"]
+    assert device_client.get_last_status("LPH21ABCD") == DEVICE_STATUS
+
+    with patch("letpot.deviceclient.systime.monotonic", return_value=200):
+        device_client._device("LPH21JKLM")
+    assert list(device_client._devices) == ["LPH21ABCD", "LPH21JKLM"]
+    assert device_client.device_stats == DeviceStateStats(
+        size=2, evicted_lru=1, evicted_ttl=1
+    )
+
+    await device_client.unsubscribe("LPH21ABCD")
+
+
+async def test_device_state_expires_without_new_devices(
+    mock_aiomqtt: MagicMock,
+) -> None:
+    """Test that device state expires when no new devices are added."""
+    device_client = LetPotDeviceClient(AUTHENTICATION, device_ttl=60)
+    with patch("letpot.deviceclient.systime.monotonic", return_value=100):
+        for device in ["LPH21ABCD", "LPH21DEFG", "LPH21GHIJ"]:
+            device_client._device(device).status = DEVICE_STATUS
+
+    with patch("letpot.deviceclient.systime.monotonic", return_value=200):
+        # Checked on access
+        assert device_client.get_last_status("LPH21DEFG") is None
+        assert device_client.device_stats.size == 2
+        # Swept when a device is used, which expired itself as well
+        assert device_client._device("LPH21ABCD").status is None
+    assert list(device_client._devices) == ["LPH21ABCD"]
+    assert device_client.device_stats.evicted_ttl == 3
+
+
+async def test_device_state_eviction_after_status_requests(
+    mock_aiomqtt: MagicMock,
+) -> None:
+    """Test that device state is evicted after timed out or failed status requests."""
+    device_client = LetPotDeviceClient(AUTHENTICATION, max_devices=2)
+    await device_client.subscribe("LPH21ABCD", lambda _: None)
+    failing_device = "LPH21JKLM"
+
+    async def publish(topic: str, payload: str) -> None:
+        if topic.startswith(failing_device):
+            raise MqttError("Publish failed")
+
+    assert device_client._client is not None
+    device_client._client.publish.side_effect = publish  # type: ignore[attr-defined]
+    for device in ["LPH21DEFG", "LPH21GHIJ", failing_device, "LPH21MNOP"]:
+        with (
+            pytest.raises(LetPotException)
+            if device == failing_device
+            else nullcontext()
+        ):
+            assert await device_client.get_current_status(device, timeout=0.01) is None
+
+    assert device_client.device_stats == DeviceStateStats(
+        size=2, evicted_lru=2, evicted_ttl=0
+    )
+    assert all(state.event is None for state in device_client._devices.values())
+
+    await device_client.unsubscribe("LPH21ABCD")
+
+
+async def test_listener_unsubscribes_last_device(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test that a listener can unsubscribe from the last device, disconnecting."""
+    device = "LPH21ABCD"
+    unsubscribed = asyncio.Event()
+
+    async def callback(status: object) -> None:
+        await device_client.unsubscribe(device)
+        unsubscribed.set()
+
+    await device_client.subscribe(device, callback)
+    client_task = device_client._client_task
+    device_client._handle_message(
+        Message(
+            topic=f"{device}/data",
+            payload=b"4d000112620100010101010000071e110001f4000000",
+            qos=0,
+            retain=False,
+            mid=1,
+            properties=None,
+        )
+    )
+
+    async with asyncio.timeout(1):
+        await unsubscribed.wait()
+    assert client_task is not None and client_task.cancelled()
+    assert len(device_client._subscriptions) == 0
+
+
+async def test_status_history(mock_aiomqtt: MagicMock) -> None:
+    """Test that received statuses are added to the history if enabled."""
+    device = "LPH21ABCD"
+    device_client = LetPotDeviceClient(AUTHENTICATION, history_size=10)
+    await device_client.subscribe(device, lambda _: None)
+    for _ in range(2):
+        device_client._handle_message(
+            Message(
+                topic=f"{device}/data",
+                payload=b"4d000112620100010101010000071e110001f4000000",
+                qos=0,
+                retain=False,
+                mid=1,
+                properties=None,
+            )
+        )
+
+    history = device_client.get_history(device)
+    assert history is not None
+    assert [value for _, value in history.values("light_brightness")] == [500, 500]
+    assert LetPotDeviceClient(AUTHENTICATION).get_history(device) is None
+
+    await device_client.unsubscribe(device)
+
+
+async def test_metrics(mock_aiomqtt: MagicMock) -> None:
+    """Test that measurements are available from stats and passed to the hook."""
+    device = "LPH21ABCD"
+    metrics: list[tuple[str, float, str | None]] = []
+    device_client = LetPotDeviceClient(
+        AUTHENTICATION, metrics_hook=lambda *metric: metrics.append(metric)
+    )
+    await device_client.subscribe(device, lambda _: None)
+
+    async def publish(topic: str, payload: str) -> None:
+        asyncio.get_running_loop().call_soon(
+            device_client._handle_message,
+            Message(
+                topic=f"{device}/data",
+                payload=b"4d000112620100010101010000071e110001f4000000",
+                qos=0,
+                retain=False,
+                mid=1,
+                properties=None,
+            ),
+        )
+
+    assert device_client._client is not None
+    device_client._client.publish.side_effect = publish  # type: ignore[attr-defined]
+    assert await device_client.get_current_status(device, timeout=1) is not None
+    await device_client._dispatcher.join()
+
+    assert {(name, label) for name, _, label in metrics} == {
+        ("connect_time", None),
+        ("message", device),
+        ("decode_time", "LPHx1Converter"),
+        ("listener_time", device),
+        ("status_latency", device),
+    }
+    stats = device_client.stats
+    assert stats.connected is True
+    assert stats.connects == 1
+    assert stats.reconnects == 0
+    assert stats.decode_time["LPHx1Converter"].count == 1
+    assert stats.status_latency.count == 1
+    assert stats.message_rates[device] > 0
+    assert stats.listeners.listener_calls == 1
+
+    await device_client.unsubscribe(device)
+
+
+async def test_reconnect_resumes_session(
+    device_client: LetPotDeviceClient, mock_aiomqtt: MagicMock
+) -> None:
+    """Test that reconnecting after a connection error resumes the session."""
+    device = "LPH21ABCD"
+    await device_client.subscribe(device, lambda _: None)
+    assert device_client._client is not None
+    client = device_client._client
+
+    client.messages.queue.put_nowait(MqttError("Connection lost"))  # type: ignore[attr-defined]
+    while mock_aiomqtt.call_count < 2:
+        await asyncio.sleep(0)
+
+    first, second = mock_aiomqtt.call_args_list
+    assert first.kwargs["clean_start"] is True
+    assert second.kwargs["clean_start"] is False
+    assert first.kwargs["identifier"] == second.kwargs["identifier"]
+    assert second.kwargs["properties"].SessionExpiryInterval == 300
+    while device_client.stats.reconnects == 0:
+        await asyncio.sleep(0)
+    assert device_client.stats.recovery_time.count == 1
+
+    await device_client.unsubscribe(device)
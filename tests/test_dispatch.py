@@ -0,0 +1,159 @@
+"""Tests for the status dispatcher."""
+
+import asyncio
+import dataclasses
+from unittest.mock import AsyncMock, MagicMock
+
+from letpot.dispatch import BackpressurePolicy, ChangeListener, LetPotStatusDispatcher
+from letpot.models import LetPotDeviceStatus
+
+from . import DEVICE_STATUS
+
+
+def _status(plant_days: int) -> LetPotDeviceStatus:
+    """Create a device status which can be recognized by the plant days."""
+    return dataclasses.replace(DEVICE_STATUS, plant_days=plant_days)
+
+
+async def test_dispatch_sync_and_async_listeners() -> None:
+    """Test that both function and coroutine function listeners are called."""
+    listener1 = MagicMock()
+    listener2 = AsyncMock()
+    dispatcher = LetPotStatusDispatcher(lambda _: [listener1, listener2])
+
+    dispatcher.dispatch("LPH21ABCD", DEVICE_STATUS)
+    await dispatcher.join()
+
+    listener1.assert_called_once_with(DEVICE_STATUS)
+    listener2.assert_awaited_once_with(DEVICE_STATUS)
+    stats = dispatcher.stats
+    assert stats.dispatched == 1
+    assert stats.listener_calls == 2
+    assert stats.queue_depth == 0
+    await dispatcher.stop()
+
+
+async def test_dispatch_listener_exception() -> None:
+    """Test that an exception in a listener doesn't prevent calling others."""
+    listener1 = MagicMock(side_effect=ValueError)
+    listener2 = MagicMock()
+    dispatcher = LetPotStatusDispatcher(lambda _: [listener1, listener2])
+
+    dispatcher.dispatch("LPH21ABCD", DEVICE_STATUS)
+    await dispatcher.join()
+
+    assert listener2.call_count == 1
+    assert dispatcher.stats.listener_errors == 1
+    await dispatcher.stop()
+
+
+async def test_dispatch_drop_oldest() -> None:
+    """Test that the oldest status is dropped when the queue is full."""
+    listener = MagicMock()
+    dispatcher = LetPotStatusDispatcher(
+        lambda _: [listener], maxsize=2, policy=BackpressurePolicy.DROP_OLDEST
+    )
+
+    for days in range(3):
+        dispatcher.dispatch("LPH21ABCD", _status(days))
+    await dispatcher.join()
+
+    assert [call.args[0].plant_days for call in listener.call_args_list] == [1, 2]
+    assert dispatcher.stats.dropped == 1
+    assert dispatcher.stats.max_queue_depth == 2
+    await dispatcher.stop()
+
+
+async def test_dispatch_coalesce_latest() -> None:
+    """Test that a queued status for a device is replaced by a newer status."""
+    listener = MagicMock()
+    dispatcher = LetPotStatusDispatcher(
+        lambda _: [listener], policy=BackpressurePolicy.COALESCE_LATEST
+    )
+
+    for days in range(3):
+        dispatcher.dispatch("LPH21ABCD", _status(days))
+    dispatcher.dispatch("LPH21DEFG", _status(10))
+    await dispatcher.join()
+
+    assert [call.args[0].plant_days for call in listener.call_args_list] == [2, 10]
+    assert dispatcher.stats.coalesced == 2
+    await dispatcher.stop()
+
+
+async def test_dispatch_block() -> None:
+    """Test that waiting for space blocks until the full queue is handled."""
+    listener = MagicMock()
+    dispatcher = LetPotStatusDispatcher(
+        lambda _: [listener], maxsize=2, policy=BackpressurePolicy.BLOCK
+    )
+
+    for days in range(3):
+        dispatcher.dispatch("LPH21ABCD", _status(days))
+    assert dispatcher.stats.queue_depth == 3
+
+    await asyncio.wait_for(dispatcher.wait_for_space(), 1)
+    assert dispatcher.stats.queue_depth < 2
+    await dispatcher.join()
+    assert listener.call_count == 3
+    assert dispatcher.stats.dropped == 0
+    await dispatcher.stop()
+
+
+async def test_dispatch_workers_keep_device_order() -> None:
+    """Test that status updates for a device are handled in order by workers."""
+    received: dict[int, list[int]] = {}
+
+    async def listener(status: LetPotDeviceStatus) -> None:
+        await asyncio.sleep(0)
+        received.setdefault(status.raw[0], []).append(status.plant_days)
+
+    dispatcher = LetPotStatusDispatcher(lambda _: [listener], workers=4)
+    for days in range(20):
+        for serial in range(8):
+            status = dataclasses.replace(_status(days), raw=[serial])
+            dispatcher.dispatch(f"LPH21{serial:04}", status)
+    await dispatcher.join()
+
+    assert len(received) == 8
+    assert all(days == list(range(20)) for days in received.values())
+    await dispatcher.stop()
+
+
+async def test_dispatch_stop_drops_queue() -> None:
+    """Test that stopping the dispatcher drops queued status updates."""
+    listener = MagicMock()
+    dispatcher = LetPotStatusDispatcher(lambda _: [listener])
+
+    dispatcher.dispatch("LPH21ABCD", DEVICE_STATUS)
+    await dispatcher.stop()
+    await asyncio.wait_for(dispatcher.join(), 1)
+
+    assert listener.call_count == 0
+    assert dispatcher.stats.queue_depth == 0
+
+
+async def test_dispatch_change_listener() -> None:
+    """Test that change listeners are only called with changed fields."""
+    callback = MagicMock()
+    plant_days_callback = MagicMock()
+    dispatcher = LetPotStatusDispatcher(
+        lambda _: [
+            ChangeListener(callback),
+            ChangeListener(plant_days_callback, frozenset({"plant_days"})),
+        ]
+    )
+
+    dispatcher.dispatch("LPH21ABCD", DEVICE_STATUS)
+    dispatcher.dispatch("LPH21ABCD", DEVICE_STATUS)
+    dispatcher.dispatch("LPH21ABCD", _status(42))
+    dispatcher.dispatch("LPH21ABCD", dataclasses.replace(_status(42), system_on=False))
+    await dispatcher.join()
+
+    assert [call.args[1] for call in callback.call_args_list] == [
+        DEVICE_STATUS.changed_fields(None),
+        {"plant_days"},
+        {"system_on"},
+    ]
+    assert plant_days_callback.call_count == 2
+    await dispatcher.stop()
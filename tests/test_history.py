@@ -0,0 +1,55 @@
+"""Tests for the status history."""
+
+import dataclasses
+import math
+
+from letpot.history import HistoryBucket, LetPotStatusHistory
+from letpot.models import LetPotDeviceErrors
+
+from . import DEVICE_STATUS
+
+
+def test_history_ring_buffer() -> None:
+    """Test that the history overwrites the oldest statuses when full."""
+    history = LetPotStatusHistory(size=3)
+    for n in range(5):
+        history.add(dataclasses.replace(DEVICE_STATUS, pump_status=n), 100 + n)
+
+    assert len(history) == 3
+    assert history.values("pump_status") == [(102, 2), (103, 3), (104, 4)]
+    assert history.values("pump_status", start=103) == [(103, 3), (104, 4)]
+    assert history.values("pump_status", end=103) == [(102, 2)]
+    # Not supported by the device
+    assert history.values("water_level") == []
+    assert math.isnan(history._values["water_level"][0])
+
+
+def test_history_errors() -> None:
+    """Test that errors are stored as bits."""
+    history = LetPotStatusHistory()
+    history.add(DEVICE_STATUS, 100)
+    history.add(
+        dataclasses.replace(
+            DEVICE_STATUS,
+            errors=LetPotDeviceErrors(low_water=False, pump_malfunction=True),
+        ),
+        101,
+    )
+    assert history.values("errors") == [(100, 1), (101, 4)]
+
+
+def test_history_aggregate() -> None:
+    """Test aggregating values per interval."""
+    history = LetPotStatusHistory()
+    for timestamp, brightness in [(0, 100), (30, 300), (59, 500), (130, 1000)]:
+        history.add(
+            dataclasses.replace(DEVICE_STATUS, light_brightness=brightness), timestamp
+        )
+
+    assert history.aggregate("light_brightness", 60) == [
+        HistoryBucket(start=0, count=3, min=100, max=500, mean=300),
+        HistoryBucket(start=120, count=1, min=1000, max=1000, mean=1000),
+    ]
+    assert history.aggregate("light_brightness", 60, start=30, end=130) == [
+        HistoryBucket(start=0, count=2, min=300, max=500, mean=400),
+    ]
@@ -0,0 +1,120 @@
+"""Tests for the packets."""
+
+from unittest.mock import patch
+
+from letpot.deviceclient import LetPotDeviceClient
+from letpot.packets import LetPotPacketCache, LetPotPacketReassembler, encode_packets
+
+from . import AUTHENTICATION
+
+MESSAGE = [98, 1, *range(250)]
+
+
+def _packets(message: list[int]) -> list[bytes]:
+    """Generate packets for a message like the device client does."""
+    device_client = LetPotDeviceClient(AUTHENTICATION)
+    device_client._message_id = 7
+    return [
+        bytes(packet)
+        for packet in device_client._generate_message_packets(1, 19, message)
+    ]
+
+
+def test_single_packet_is_returned() -> None:
+    """Test that a message in one packet is returned as-is."""
+    reassembler = LetPotPacketReassembler()
+    packet = bytes.fromhex("4d000112620100010101010000071e110001f4000000")
+    assert reassembler.add("LPH21ABCD", packet) is packet
+
+
+def test_multiple_packets_are_reassembled() -> None:
+    """Test that a message split over multiple packets is reassembled."""
+    reassembler = LetPotPacketReassembler()
+    packets = _packets(MESSAGE)
+    assert len(packets) == 3
+
+    assert reassembler.add("LPH21ABCD", packets[0]) is None
+    assert reassembler.add("LPH21ABCD", packets[1]) is None
+    message = reassembler.add("LPH21ABCD", packets[2])
+    assert message is not None
+    assert message[:3] == bytes([77, 0, 9])
+    assert list(message[4:]) == MESSAGE
+    assert reassembler.reassembled_messages == 1
+    assert reassembler.dropped_packets == 0
+
+
+def test_interleaved_devices_are_reassembled() -> None:
+    """Test that packets for different devices are reassembled separately."""
+    reassembler = LetPotPacketReassembler()
+    packets = _packets(MESSAGE)
+
+    for packet in packets[:-1]:
+        assert reassembler.add("LPH21ABCD", packet) is None
+        assert reassembler.add("LPH62ABCD", packet) is None
+    assert reassembler.add("LPH21ABCD", packets[-1]) is not None
+    assert reassembler.add("LPH62ABCD", packets[-1]) is not None
+
+
+def test_out_of_sequence_is_dropped() -> None:
+    """Test that a missing packet drops the incomplete message."""
+    reassembler = LetPotPacketReassembler()
+    packets = _packets(MESSAGE)
+
+    assert reassembler.add("LPH21ABCD", packets[0]) is None
+    # Final packet without its predecessor is handled as a message on its own
+    assert reassembler.add("LPH21ABCD", packets[2]) is packets[2]
+    assert reassembler.dropped_packets == 1
+    assert reassembler.reassembled_messages == 0
+
+
+def test_limits_drop_messages() -> None:
+    """Test that messages exceeding the length or device limit are dropped."""
+    reassembler = LetPotPacketReassembler(max_pending=1, max_length=200)
+    packets = _packets(MESSAGE)
+    assert reassembler.add("LPH21ABCD", packets[0]) is None
+    assert reassembler.dropped_packets == 1
+
+    reassembler.max_length = 4096
+    assert reassembler.add("LPH21ABCD", packets[0]) is None
+    assert reassembler.add("LPH62ABCD", packets[0]) is None
+    assert reassembler.dropped_packets == 2
+    # Drops LPH62ABCD, remaining packets don't add up to the message length
+    assert reassembler.add("LPH21ABCD", packets[1]) is None
+    assert reassembler.add("LPH21ABCD", packets[2]) is None
+    assert reassembler.dropped_packets == 5
+
+
+def test_timeout_drops_message() -> None:
+    """Test that an incomplete message is dropped after the timeout."""
+    reassembler = LetPotPacketReassembler(timeout=10)
+    packets = _packets(MESSAGE)
+
+    with patch("letpot.packets.systime.monotonic", return_value=100):
+        assert reassembler.add("LPH21ABCD", packets[0]) is None
+    with patch("letpot.packets.systime.monotonic", return_value=111):
+        assert reassembler.add("LPH21ABCD", packets[1]) is None
+    assert reassembler.dropped_packets == 1
+
+
+def test_encode_packets() -> None:
+    """Test encoding a message over multiple packets with consecutive message ids."""
+    packets = encode_packets(77, bytes(MESSAGE), 255, 128)
+    assert [bytes(packet[:6]) for packet in packets[:2]] == [
+        bytes([77, 16, 255, 126, 252, 0]),
+        bytes([77, 16, 0, 126, 252, 0]),
+    ]
+    assert bytes(packets[2][:4]) == bytes([77, 0, 1, 8])
+    assert b"".join(packet[6:] for packet in packets[:2]) + packets[2][4:] == bytes(
+        MESSAGE
+    )
+
+
+def test_packet_cache_patches_message_id() -> None:
+    """Test that cached packets are equal to encoded packets with the message id."""
+    cache = LetPotPacketCache(128)
+    for message_id in [0, 7, 255]:
+        for message in [bytes([97, 1]), bytes(MESSAGE)]:
+            assert cache.get(77, message, message_id) == encode_packets(
+                77, message, message_id, 128
+            )
+    assert len(cache._packets) == 2
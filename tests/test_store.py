@@ -0,0 +1,51 @@
+"""Tests for the status stores."""
+
+from pathlib import Path
+
+from letpot.store import MemoryStatusStore, SQLiteStatusStore, StoredStatus
+
+STATUS = StoredStatus(
+    bytes.fromhex("4d000112620100010101010000071e110001f4000000"), 1700000000.0
+)
+
+
+def test_memory_store_lru() -> None:
+    """Test that the memory store removes the least recently used device."""
+    store = MemoryStatusStore(maxsize=2)
+    store.set("LPH21ABCD", STATUS)
+    store.set("LPH21DEFG", STATUS)
+    assert store.get("LPH21ABCD") == STATUS
+    store.set("LPH21GHIJ", STATUS)
+
+    assert len(store) == 2
+    assert store.get("LPH21DEFG") is None
+    assert store.get("LPH21ABCD") == STATUS
+    store.delete("LPH21ABCD")
+    assert store.get("LPH21ABCD") is None
+
+
+def test_sqlite_store_persists(tmp_path: Path) -> None:
+    """Test that the SQLite store keeps statuses after closing."""
+    store = SQLiteStatusStore(tmp_path / "status.db")
+    store.set("LPH21ABCD", StoredStatus(b"\x00", 1))
+    store.set("LPH21ABCD", STATUS)
+    store.set("LPH21DEFG", STATUS)
+    store.delete("LPH21DEFG")
+    store.close()
+
+    store = SQLiteStatusStore(tmp_path / "status.db")
+    assert store.get("LPH21ABCD") == STATUS
+    assert store.get("LPH21DEFG") is None
+    assert store.get("LPH21ABCD").age > 0  # type: ignore[union-attr]
+    store.close()
+
+
+def test_sqlite_store_many(tmp_path: Path) -> None:
+    """Test storing and getting statuses for multiple devices at once."""
+    store = SQLiteStatusStore(tmp_path / "status.db")
+    store.set_many({"LPH21ABCD": STATUS, "LPH21DEFG": STATUS})
+    assert store.get_many(["LPH21ABCD", "LPH21DEFG", "LPH21GHIJ"]) == {
+        "LPH21ABCD": STATUS,
+        "LPH21DEFG": STATUS,
+    }
+    store.close()